@@ -0,0 +1,287 @@
+# ============================================
+# GENERATOR JADWAL OTOMATIS
+# Menyusun jadwal tanpa konflik ruangan/dosen di atas Modul Jadwal
+# ============================================
+
+import heapq
+import os
+import random
+import time as clock
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import time
+from typing import List
+
+from Jadwal import Jadwal, ScheduleService
+
+# ==============================
+# INPUT
+# ==============================
+
+class Kursus:
+    def __init__(self, kode, mata_kuliah, dosen, kapasitas, durasi=2, slot_diizinkan=None):
+        self.kode = kode
+        self.mata_kuliah = mata_kuliah
+        self.dosen = dosen
+        self.kapasitas = kapasitas
+        self.durasi = durasi
+        # Indeks slot yang boleh dipakai; None berarti semua slot sepanjang `durasi` jam.
+        self.slot_diizinkan = slot_diizinkan
+
+class Ruangan:
+    def __init__(self, nama, kapasitas):
+        self.nama = nama
+        self.kapasitas = kapasitas
+
+class Slot:
+    def __init__(self, hari, jam_mulai, jam_selesai):
+        self.hari = hari
+        self.jam_mulai = jam_mulai
+        self.jam_selesai = jam_selesai
+
+    @property
+    def durasi(self):
+        return (self.jam_selesai.hour * 60 + self.jam_selesai.minute
+                - self.jam_mulai.hour * 60 - self.jam_mulai.minute) / 60
+
+    def overlap(self, other):
+        return (self.hari == other.hari
+                and self.jam_mulai < other.jam_selesai and other.jam_mulai < self.jam_selesai)
+
+class HasilGenerator:
+    def __init__(self, seed, jadwal, tidak_terjadwal, pemborosan, waktu):
+        self.seed = seed
+        self.jadwal: List[Jadwal] = jadwal
+        self.tidak_terjadwal: List[Kursus] = tidak_terjadwal
+        # Total kursi kosong (kapasitas ruangan - kapasitas kursus).
+        self.pemborosan = pemborosan
+        self.waktu = waktu
+
+    def __repr__(self):
+        return (
+            f"HasilGenerator(seed={self.seed}, terjadwal={len(self.jadwal)}, "
+            f"tidak_terjadwal={len(self.tidak_terjadwal)}, pemborosan={self.pemborosan}, "
+            f"waktu={self.waktu:.2f}s)"
+        )
+
+# ==============================
+# SOLVER
+# ==============================
+
+class Problem:
+    # Bentuk ringkas yang dikirim ke proses worker: semua objek diganti indeks.
+
+    def __init__(self, kursus, ruangan, slots):
+        self.n_slot = len(slots)
+        # Slot yang saling tumpang tindih (termasuk dirinya sendiri); memakai
+        # slot s memblokir semua slot di overlaps[s] untuk ruangan dan dosen itu.
+        self.overlaps = [
+            [t for t, other in enumerate(slots) if slot.overlap(other)] for slot in slots
+        ]
+
+        urut = sorted(range(len(ruangan)), key=lambda r: ruangan[r].kapasitas)
+        self.room_order = urut
+        self.room_caps = [ruangan[r].kapasitas for r in urut]
+
+        dosen_ids = {}
+        self.need = []
+        self.dosen = []
+        self.allowed = []
+        self.fit_start = []
+        for k in kursus:
+            self.need.append(k.kapasitas)
+            self.dosen.append(dosen_ids.setdefault(k.dosen, len(dosen_ids)))
+            allowed = range(len(slots)) if k.slot_diizinkan is None else k.slot_diizinkan
+            self.allowed.append([s for s in allowed if slots[s].durasi == k.durasi])
+            # Ruangan terurut menurut kapasitas; yang muat mulai dari indeks ini.
+            self.fit_start.append(bisect_left(self.room_caps, k.kapasitas))
+        self.n_dosen = len(dosen_ids)
+
+        self.kursus_per_dosen = [[] for _ in range(self.n_dosen)]
+        for c, d in enumerate(self.dosen):
+            self.kursus_per_dosen[d].append(c)
+
+def solve_once(problem, seed):
+    # Pewarnaan graf ala DSatur: kursus dengan pilihan (slot, ruangan) paling
+    # sedikit dijadwalkan lebih dulu, ke slot yang ruangan muat terkecilnya
+    # paling pas (best-fit). `seed` mengacak urutan seri untuk restart.
+    rng = random.Random(seed)
+    p = problem
+    n_room = len(p.room_caps)
+    room_block = [[0] * p.n_slot for _ in range(n_room)]
+    dosen_block = [[0] * p.n_slot for _ in range(p.n_dosen)]
+    slot_load = [0] * p.n_slot
+    noise = [rng.random() for _ in range(len(p.need))]
+
+    def priority(c):
+        free = sum(1 for s in p.allowed[c] if not dosen_block[p.dosen[c]][s])
+        return free * (n_room - p.fit_start[c]), -p.need[c], noise[c]
+
+    prio = [priority(c) for c in range(len(p.need))]
+    heap = [(prio[c], c) for c in range(len(p.need))]
+    heapq.heapify(heap)
+    assigned = {}
+    gagal = []
+
+    while heap:
+        key, c = heapq.heappop(heap)
+        if c in assigned or key != prio[c]:
+            continue
+
+        best = None
+        d = p.dosen[c]
+        for s in p.allowed[c]:
+            if dosen_block[d][s]:
+                continue
+            for r in range(p.fit_start[c], n_room):
+                if not room_block[r][s]:
+                    score = (p.room_caps[r] - p.need[c], slot_load[s] + rng.random())
+                    if best is None or score < best[0]:
+                        best = (score, s, r)
+                    break
+
+        if best is None:
+            gagal.append(c)
+            prio[c] = None
+            continue
+
+        _, s, r = best
+        assigned[c] = (s, r)
+        for t in p.overlaps[s]:
+            room_block[r][t] += 1
+            dosen_block[d][t] += 1
+            slot_load[t] += 1
+        # Hanya kursus dosen yang sama kehilangan slot; saturasi mereka dihitung ulang.
+        for other in p.kursus_per_dosen[d]:
+            if other not in assigned and prio[other] is not None:
+                prio[other] = priority(other)
+                heapq.heappush(heap, (prio[other], other))
+
+    pemborosan = sum(p.room_caps[r] - p.need[c] for c, (s, r) in assigned.items())
+    return seed, [(c, s, p.room_order[r]) for c, (s, r) in assigned.items()], gagal, pemborosan
+
+_worker_problem = None
+
+def _init_worker(problem):
+    # Problem dikirim sekali per proses, bukan sekali per restart.
+    global _worker_problem
+    _worker_problem = problem
+
+def _solve_in_worker(seed):
+    return solve_once(_worker_problem, seed)
+
+def generate_jadwal(kursus, ruangan, slots, restarts=8, workers=None, seed=0):
+    # Restart dengan seed berbeda dibagi ke process pool; hasil terbaik adalah
+    # yang paling sedikit kursus tak terjadwal, lalu paling sedikit kursi kosong.
+    # Begitu ada hasil lengkap, restart yang belum mulai dibatalkan.
+    started = clock.perf_counter()
+    problem = Problem(kursus, ruangan, slots)
+    seeds = [seed + i for i in range(restarts)]
+
+    best = None
+    if workers == 1:
+        for s in seeds:
+            result = solve_once(problem, s)
+            if best is None or (len(result[2]), result[3]) < (len(best[2]), best[3]):
+                best = result
+            if not best[2]:
+                break
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(problem,)) as pool:
+            futures = [pool.submit(_solve_in_worker, s) for s in seeds]
+            for future in as_completed(futures):
+                result = future.result()
+                if best is None or (len(result[2]), result[3]) < (len(best[2]), best[3]):
+                    best = result
+                if not best[2]:
+                    for f in futures:
+                        f.cancel()
+                    break
+
+    best_seed, assignment, gagal, pemborosan = best
+    jadwal = []
+    for c, s, r in sorted(assignment):
+        k, slot = kursus[c], slots[s]
+        jadwal.append(Jadwal(
+            kode=k.kode,
+            mata_kuliah=k.mata_kuliah,
+            hari=slot.hari,
+            jam_mulai=slot.jam_mulai,
+            jam_selesai=slot.jam_selesai,
+            ruangan=ruangan[r].nama,
+            dosen=k.dosen,
+            kapasitas=k.kapasitas
+        ))
+    return HasilGenerator(
+        best_seed, jadwal, [kursus[c] for c in gagal], pemborosan, clock.perf_counter() - started
+    )
+
+def terapkan(service: ScheduleService, hasil: HasilGenerator):
+    # Dimasukkan lewat import_jadwal, sehingga hasil solver diperiksa ulang
+    # oleh deteksi konflik service dan observer menerima satu notifikasi batch.
+    return service.import_jadwal(hasil.jadwal)
+
+# ==============================
+# BENCHMARK
+# ==============================
+
+HARI = ["Senin", "Selasa", "Rabu", "Kamis", "Jumat"]
+
+def slot_standar():
+    # Blok 2 jam dan blok 3 jam yang saling tumpang tindih di setiap hari.
+    slots = []
+    for hari in HARI:
+        for jam in (7, 9, 11, 13, 15, 17):
+            slots.append(Slot(hari, time(jam, 0), time(jam + 2, 0)))
+        for jam in (8, 13, 16):
+            slots.append(Slot(hari, time(jam, 0), time(jam + 3, 0)))
+    return slots
+
+def instance_sintetis(n_kursus=2000, n_ruangan=150, n_dosen=400, hari_per_dosen=3, seed=2024):
+    # Setiap dosen hanya bersedia mengajar pada `hari_per_dosen` hari tertentu.
+    rng = random.Random(seed)
+    slots = slot_standar()
+    ruangan = [Ruangan(f"R{i:03d}", rng.choice([30, 40, 40, 50, 60, 80, 100, 150])) for i in range(n_ruangan)]
+    ketersediaan = {}
+    kursus = []
+    for i in range(n_kursus):
+        dosen = f"D{rng.randrange(n_dosen):04d}"
+        if dosen not in ketersediaan:
+            hari = set(rng.sample(HARI, hari_per_dosen))
+            ketersediaan[dosen] = [s for s, slot in enumerate(slots) if slot.hari in hari]
+        kursus.append(Kursus(
+            kode=f"K{i:05d}",
+            mata_kuliah=f"Mata Kuliah {i}",
+            dosen=dosen,
+            kapasitas=min(int(rng.expovariate(1 / 35)) + 10, 150),
+            durasi=rng.choice([2, 2, 2, 3]),
+            slot_diizinkan=ketersediaan[dosen]
+        ))
+    return kursus, ruangan, slots
+
+def benchmark(n_kursus, n_ruangan, n_dosen, hari_per_dosen, restarts, workers_list):
+    kursus, ruangan, slots = instance_sintetis(n_kursus, n_ruangan, n_dosen, hari_per_dosen)
+    print(
+        f"{n_kursus} kursus, {n_ruangan} ruangan, {n_dosen} dosen x {hari_per_dosen} hari, "
+        f"{len(slots)} slot, {restarts} restart, {os.cpu_count()} CPU"
+    )
+    for workers in workers_list:
+        hasil = generate_jadwal(kursus, ruangan, slots, restarts=restarts, workers=workers)
+        service = ScheduleService()
+        report = terapkan(service, hasil)
+        kapasitas = {r.nama: r.kapasitas for r in ruangan}
+        muat = all(j.kapasitas <= kapasitas[j.ruangan] for j in service.jadwal_list)
+        print(f"workers={workers}: {hasil}  konflik={len(report.konflik)}  ruangan_muat={muat}")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generator jadwal otomatis - benchmark instance sintetis")
+    parser.add_argument("--kursus", type=int, default=2000)
+    parser.add_argument("--ruangan", type=int, default=150)
+    parser.add_argument("--dosen", type=int, default=400)
+    parser.add_argument("--hari-per-dosen", type=int, default=3)
+    parser.add_argument("--restarts", type=int, default=8)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count()])
+    args = parser.parse_args()
+    benchmark(args.kursus, args.ruangan, args.dosen, args.hari_per_dosen, args.restarts, args.workers)
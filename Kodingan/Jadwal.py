@@ -3,14 +3,22 @@
 # Single File Implementation
 # ============================================
 
-from typing import List
+from typing import Dict, List
 from datetime import time
+from bisect import bisect_left, bisect_right
+from heapq import heappop, heappush
+from collections import deque
+import threading
+import time as clock
 
 # ==============================
 # ENTITY
 # ==============================
 
 class Jadwal:
+    # Tanpa __dict__ per objek; satu semester bisa berisi puluhan ribu jadwal.
+    __slots__ = ("kode", "mata_kuliah", "hari", "jam_mulai", "jam_selesai", "ruangan", "dosen", "kapasitas")
+
     def __init__(self, kode, mata_kuliah, hari, jam_mulai, jam_selesai, ruangan, dosen, kapasitas):
         self.kode = kode
         self.mata_kuliah = mata_kuliah
@@ -29,43 +37,273 @@ class Observer:
     def update(self, event, jadwal):
         pass
 
+    def update_batch(self, event, jadwal_list):
+        for jadwal in jadwal_list:
+            self.update(event, jadwal)
+
 class StudentObserver(Observer):
     def update(self, event, jadwal):
         print(f"[NOTIF MAHASISWA] {event} - {jadwal.mata_kuliah}")
 
+    def update_batch(self, event, jadwal_list):
+        print(f"[NOTIF MAHASISWA] {event} - {len(jadwal_list)} jadwal")
+
 class LecturerObserver(Observer):
     def update(self, event, jadwal):
         print(f"[NOTIF DOSEN] {event} - {jadwal.mata_kuliah}")
 
+    def update_batch(self, event, jadwal_list):
+        print(f"[NOTIF DOSEN] {event} - {len(jadwal_list)} jadwal")
+
 class AdminObserver(Observer):
     def update(self, event, jadwal):
         print(f"[NOTIF ADMIN] {event} - {jadwal.mata_kuliah}")
 
+    def update_batch(self, event, jadwal_list):
+        print(f"[NOTIF ADMIN] {event} - {len(jadwal_list)} jadwal")
+
+class ObserverWorker:
+    # Antrian terbatas + thread pengirim untuk satu observer. publish() tidak
+    # pernah menunggu observer: saat antrian penuh, event terbaru
+    # ("drop_newest") atau terlama ("drop_oldest") dibuang. Event berurutan
+    # dengan jenis yang sama digabung menjadi satu update_batch; batch yang
+    # gagal dicoba ulang dengan backoff eksponensial lalu dilewati.
+
+    POLICIES = ("drop_newest", "drop_oldest")
+
+    def __init__(self, observer, maxsize=10000, batch_size=100, policy="drop_newest",
+                 retries=3, backoff=0.1):
+        if policy not in self.POLICIES:
+            raise ValueError(f"policy harus salah satu dari {self.POLICIES}")
+        self.observer = observer
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.policy = policy
+        self.retries = retries
+        self.backoff = backoff
+        self.delivered = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = deque()
+        self._busy = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def publish(self, event, jadwal_list):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("ObserverWorker sudah ditutup")
+            for jadwal in jadwal_list:
+                if len(self._queue) >= self.maxsize:
+                    self.dropped += 1
+                    if self.policy == "drop_newest":
+                        continue
+                    self._queue.popleft()
+                self._queue.append((event, jadwal))
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                self._busy = True
+
+            i = 0
+            while i < len(batch):
+                event = batch[i][0]
+                j = i
+                while j < len(batch) and batch[j][0] == event:
+                    j += 1
+                self._deliver(event, [jadwal for _, jadwal in batch[i:j]])
+                i = j
+
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+    def _deliver(self, event, jadwal_list):
+        for attempt in range(self.retries + 1):
+            try:
+                if len(jadwal_list) == 1:
+                    self.observer.update(event, jadwal_list[0])
+                else:
+                    self.observer.update_batch(event, jadwal_list)
+                self.delivered += len(jadwal_list)
+                return
+            except Exception:
+                if attempt < self.retries:
+                    clock.sleep(self.backoff * 2 ** attempt)
+        self.failed += len(jadwal_list)
+
+    def flush(self, timeout=None):
+        # Tunggu sampai semua event yang sudah masuk antrian terkirim.
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue and not self._busy, timeout)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
 class ScheduleSubject:
-    def __init__(self):
+    def __init__(self, async_mode=False, **worker_options):
+        # async_mode=True: setiap observer dilayani ObserverWorker sendiri;
+        # worker_options diteruskan ke ObserverWorker (maxsize, batch_size,
+        # policy, retries, backoff).
         self.observers: List[Observer] = []
+        self.async_mode = async_mode
+        self.worker_options = worker_options
+        self.workers: List[ObserverWorker] = []
 
     def attach(self, observer):
         self.observers.append(observer)
+        if self.async_mode:
+            self.workers.append(ObserverWorker(observer, **self.worker_options))
 
     def notify(self, event, jadwal):
+        if self.async_mode:
+            for worker in self.workers:
+                worker.publish(event, [jadwal])
+            return
         for obs in self.observers:
             obs.update(event, jadwal)
 
+    def notify_batch(self, event, jadwal_list):
+        if self.async_mode:
+            for worker in self.workers:
+                worker.publish(event, jadwal_list)
+            return
+        for obs in self.observers:
+            obs.update_batch(event, jadwal_list)
+
+    def flush(self, timeout=None):
+        return all(worker.flush(timeout) for worker in self.workers)
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
+
+# ==============================
+# IMPORT REPORT
+# ==============================
+
+class KonflikJadwal:
+    def __init__(self, jenis, jadwal_a, jadwal_b):
+        self.jenis = jenis
+        self.jadwal_a = jadwal_a
+        self.jadwal_b = jadwal_b
+
+    def __repr__(self):
+        return f"{self.jenis}: {self.jadwal_a.kode} x {self.jadwal_b.kode}"
+
+class ImportReport:
+    def __init__(self):
+        self.diterima: List[Jadwal] = []
+        self.ditolak: List[Jadwal] = []
+        self.tidak_valid: List[Jadwal] = []
+        self.konflik: List[KonflikJadwal] = []
+
+    def __repr__(self):
+        return (
+            f"ImportReport(diterima={len(self.diterima)}, ditolak={len(self.ditolak)}, "
+            f"tidak_valid={len(self.tidak_valid)}, konflik={len(self.konflik)})"
+        )
+
+# ==============================
+# INTERVAL INDEX
+# ==============================
+
+class IntervalIndex:
+    # Jadwal dikelompokkan per kunci (mis. (hari, ruangan)) dan diurutkan
+    # menurut (jam_mulai, jam_selesai). Jadwal yang bentrok tidak pernah
+    # masuk, sehingga interval dalam satu kunci saling lepas dan jam_selesai
+    # ikut terurut: cukup satu tetangga kiri yang perlu diperiksa.
+    # Diasumsikan jam_mulai <= jam_selesai.
+
+    def __init__(self, key_func):
+        self.key_func = key_func
+        self.slots = {}
+
+    @staticmethod
+    def _bounds(jadwal):
+        return jadwal.jam_mulai, jadwal.jam_selesai
+
+    def find_overlap(self, jadwal):
+        items = self.slots.get(self.key_func(jadwal))
+        if not items:
+            return None
+        # Semua entri sebelum i dimulai sebelum jadwal ini selesai.
+        i = bisect_left(items, (jadwal.jam_selesai,), key=self._bounds)
+        if i and items[i - 1].jam_selesai > jadwal.jam_mulai:
+            return items[i - 1]
+        return None
+
+    def add(self, jadwal):
+        items = self.slots.setdefault(self.key_func(jadwal), [])
+        items.insert(bisect_right(items, self._bounds(jadwal), key=self._bounds), jadwal)
+
+    def remove(self, jadwal):
+        slot_key = self.key_func(jadwal)
+        items = self.slots[slot_key]
+        i = bisect_left(items, self._bounds(jadwal), key=self._bounds)
+        while items[i] is not jadwal:
+            i += 1
+        del items[i]
+        if not items:
+            del self.slots[slot_key]
+
 # ==============================
 # SERVICE
 # ==============================
 
 class ScheduleService:
-    def __init__(self):
-        self.jadwal_list: List[Jadwal] = []
-        self.subject = ScheduleSubject()
+    def __init__(self, async_notify=False, **worker_options):
+        # kode -> Jadwal; urutan dict mengikuti urutan penambahan, sama seperti
+        # list sebelumnya, sedangkan cari/ubah/hapus per kode menjadi O(1).
+        self.jadwal_by_kode: Dict[str, Jadwal] = {}
+        self.subject = ScheduleSubject(async_notify, **worker_options)
+        self.ruangan_index = IntervalIndex(lambda j: (j.hari, j.ruangan))
+        self.dosen_index = IntervalIndex(lambda j: (j.hari, j.dosen))
+
+    @property
+    def jadwal_list(self) -> List[Jadwal]:
+        return list(self.jadwal_by_kode.values())
+
+    def get_jadwal(self, kode):
+        return self.jadwal_by_kode.get(kode)
 
     def is_time_overlap(self, j1, j2):
         return j1.jam_mulai < j2.jam_selesai and j2.jam_mulai < j1.jam_selesai
 
-    def detect_conflict(self, new_jadwal):
-        for j in self.jadwal_list:
+    def _index(self, jadwal):
+        self.ruangan_index.add(jadwal)
+        self.dosen_index.add(jadwal)
+
+    def _unindex(self, jadwal):
+        self.ruangan_index.remove(jadwal)
+        self.dosen_index.remove(jadwal)
+
+    def detect_conflict(self, new_jadwal, abaikan=None):
+        # O(log n) per kunci; konflik ruangan didahulukan dari konflik dosen.
+        # `abaikan` (jadwal lama saat update) sudah dikeluarkan dari indeks.
+        if self.ruangan_index.find_overlap(new_jadwal):
+            return "KONFLIK RUANGAN"
+        if self.dosen_index.find_overlap(new_jadwal):
+            return "KONFLIK DOSEN"
+        return None
+
+    def detect_conflict_linear(self, new_jadwal, abaikan=None):
+        # Pemindaian penuh seluruh jadwal, dipakai sebagai pembanding di benchmark.
+        for j in self.jadwal_by_kode.values():
+            if j is abaikan:
+                continue
             if j.hari == new_jadwal.hari and self.is_time_overlap(j, new_jadwal):
                 if j.ruangan == new_jadwal.ruangan:
                     return "KONFLIK RUANGAN"
@@ -74,40 +312,228 @@ class ScheduleService:
         return None
 
     def create_jadwal(self, jadwal):
+        if jadwal.kode in self.jadwal_by_kode:
+            print("[ERROR] KODE SUDAH ADA")
+            return
+        if jadwal.jam_mulai >= jadwal.jam_selesai:
+            print("[ERROR] JAM MULAI HARUS SEBELUM JAM SELESAI")
+            return
+
         conflict = self.detect_conflict(jadwal)
         if conflict:
             print(f"[ERROR] {conflict}")
             return
 
-        self.jadwal_list.append(jadwal)
+        self.jadwal_by_kode[jadwal.kode] = jadwal
+        self._index(jadwal)
         self.subject.notify("JADWAL DITAMBAHKAN", jadwal)
 
     def update_jadwal(self, kode, jadwal_baru):
-        for i, j in enumerate(self.jadwal_list):
-            if j.kode == kode:
-                self.jadwal_list.pop(i)
-                conflict = self.detect_conflict(jadwal_baru)
-                if conflict:
-                    print(f"[ERROR] {conflict}")
-                    self.jadwal_list.insert(i, j)
-                    return
+        j = self.jadwal_by_kode.get(kode)
+        if j is None:
+            return
+        if jadwal_baru.kode != kode and jadwal_baru.kode in self.jadwal_by_kode:
+            print("[ERROR] KODE SUDAH ADA")
+            return
+        if jadwal_baru.jam_mulai >= jadwal_baru.jam_selesai:
+            print("[ERROR] JAM MULAI HARUS SEBELUM JAM SELESAI")
+            return
 
-                self.jadwal_list.insert(i, jadwal_baru)
-                self.subject.notify("JADWAL DIUBAH", jadwal_baru)
-                return
+        self._unindex(j)
+        conflict = self.detect_conflict(jadwal_baru, abaikan=j)
+        if conflict:
+            print(f"[ERROR] {conflict}")
+            self._index(j)
+            return
+
+        if jadwal_baru.kode == kode:
+            self.jadwal_by_kode[kode] = jadwal_baru
+        else:
+            # Kode berganti: dict dibangun ulang agar posisinya tetap, O(n).
+            self.jadwal_by_kode = {
+                (jadwal_baru.kode if k == kode else k): (jadwal_baru if k == kode else v)
+                for k, v in self.jadwal_by_kode.items()
+            }
+        self._index(jadwal_baru)
+        self.subject.notify("JADWAL DIUBAH", jadwal_baru)
 
     def delete_jadwal(self, kode):
-        for j in self.jadwal_list:
-            if j.kode == kode:
-                self.jadwal_list.remove(j)
-                self.subject.notify("JADWAL DIHAPUS", j)
-                return
+        j = self.jadwal_by_kode.pop(kode, None)
+        if j is None:
+            return
+        self._unindex(j)
+        self.subject.notify("JADWAL DIHAPUS", j)
+
+    def _sweep(self, jenis, key_func, rows, baru, skip_pair=None):
+        # Satu sapuan per kunci (hari, ruangan) / (hari, dosen): jadwal diurutkan
+        # menurut jam_mulai, heap berisi jadwal yang masih berlangsung. Semua
+        # pasangan yang tumpang tindih dilaporkan, O(n log n + jumlah konflik).
+        groups = {}
+        for j in rows:
+            groups.setdefault(key_func(j), []).append(j)
+
+        konflik = []
+        for group in groups.values():
+            if len(group) < 2:
+                continue
+            group.sort(key=lambda j: (j.jam_mulai, j.jam_selesai))
+            active = []
+            for seq, j in enumerate(group):
+                while active and active[0][0] <= j.jam_mulai:
+                    heappop(active)
+                for _, _, a in active:
+                    if (id(a) in baru or id(j) in baru) and not (skip_pair and skip_pair(a, j)):
+                        konflik.append(KonflikJadwal(jenis, a, j))
+                heappush(active, (j.jam_selesai, seq, j))
+        return konflik
+
+    def import_jadwal(self, rows):
+        # Semua baris diperiksa dulu terhadap satu sama lain dan jadwal yang sudah
+        # ada; hanya baris tanpa konflik yang disimpan, sekaligus, dengan satu
+        # notifikasi batch. Baris dengan jam terbalik atau kode yang sudah
+        # dipakai masuk tidak_valid.
+        report = ImportReport()
+        valid = []
+        kode_baru = set()
+        for j in rows:
+            if j.jam_mulai < j.jam_selesai and j.kode not in self.jadwal_by_kode and j.kode not in kode_baru:
+                kode_baru.add(j.kode)
+                valid.append(j)
+            else:
+                report.tidak_valid.append(j)
+
+        baru = {id(j) for j in valid}
+        semua = self.jadwal_list + valid
+        report.konflik = self._sweep("KONFLIK RUANGAN", lambda j: (j.hari, j.ruangan), semua, baru)
+        # Pasangan yang juga seruangan sudah tercatat sebagai konflik ruangan.
+        report.konflik += self._sweep(
+            "KONFLIK DOSEN", lambda j: (j.hari, j.dosen), semua, baru,
+            skip_pair=lambda a, b: a.ruangan == b.ruangan
+        )
+
+        bentrok = {id(j) for k in report.konflik for j in (k.jadwal_a, k.jadwal_b)}
+        for j in valid:
+            (report.ditolak if id(j) in bentrok else report.diterima).append(j)
+
+        for j in report.diterima:
+            self.jadwal_by_kode[j.kode] = j
+            self._index(j)
+        if report.diterima:
+            self.subject.notify_batch("JADWAL DITAMBAHKAN", report.diterima)
+        return report
+
+# ==============================
+# BENCHMARK
+# ==============================
+
+HARI = ["Senin", "Selasa", "Rabu", "Kamis", "Jumat", "Sabtu"]
+
+class LinearScheduleService(ScheduleService):
+    # Perilaku sebelum ada indeks: setiap cek konflik memindai seluruh list.
+    def detect_conflict(self, new_jadwal, abaikan=None):
+        return self.detect_conflict_linear(new_jadwal, abaikan)
+
+    def _index(self, jadwal):
+        pass
+
+    def _unindex(self, jadwal):
+        pass
+
+def random_jadwal(rng, kode, n):
+    mulai = rng.randrange(7, 18)
+    return Jadwal(
+        kode=kode,
+        mata_kuliah=f"MK {kode}",
+        hari=rng.choice(HARI),
+        jam_mulai=time(mulai, 0),
+        jam_selesai=time(min(mulai + rng.randrange(1, 4), 21), 0),
+        ruangan=f"R{rng.randrange(max(n // 60, 10)):03d}",
+        dosen=f"D{rng.randrange(max(n // 4, 10)):04d}",
+        kapasitas=rng.randrange(20, 120)
+    )
+
+def benchmark(n, seed=2024):
+    import io
+    import random
+    from contextlib import redirect_stdout
+
+    rng = random.Random(seed)
+    creates = [random_jadwal(rng, f"J{i:06d}", n) for i in range(n)]
+    updates = []
+    for _ in range(n // 10):
+        kode = f"J{rng.randrange(n):06d}"
+        updates.append((kode, random_jadwal(rng, kode, n)))
+    deletes = [f"J{rng.randrange(n):06d}" for _ in range(n // 10)]
+
+    hasil = {}
+    for name, cls in (("linear", LinearScheduleService), ("index", ScheduleService)):
+        service = cls()
+        laporan = []
+        with redirect_stdout(io.StringIO()):
+            for fase, ops in (
+                ("create", [(service.create_jadwal, (j,)) for j in creates]),
+                ("update", [(service.update_jadwal, args) for args in updates]),
+                ("delete", [(service.delete_jadwal, (kode,)) for kode in deletes]),
+            ):
+                started = clock.perf_counter()
+                for fn, args in ops:
+                    fn(*args)
+                laporan.append(f"{fase} {len(ops) / (clock.perf_counter() - started):9.0f} ops/s")
+        hasil[name] = [j.kode for j in service.jadwal_list]
+        print(f"{name:>6}: " + "  ".join(laporan) + f"  ({len(service.jadwal_list)} jadwal tersimpan)")
+
+    print("hasil identik:", hasil["linear"] == hasil["index"])
+
+def ukur_memori(n, seed=2024):
+    import random
+    import tracemalloc
+
+    rng = random.Random(seed)
+    # Atribut dibuat lebih dulu agar yang terukur hanya objek Jadwal dan struktur
+    # service. Setiap ruangan/dosen mendapat 30 blok 2 jam yang saling lepas,
+    # sehingga seluruh N jadwal tersimpan.
+    atribut = []
+    for i in range(n):
+        mulai = 7 + 2 * ((i // 6) % 5)
+        atribut.append(dict(
+            kode=f"J{i:06d}", mata_kuliah=f"MK {i}", hari=HARI[i % 6],
+            jam_mulai=time(mulai, 0), jam_selesai=time(mulai + 2, 0),
+            ruangan=f"R{i // 30:05d}", dosen=f"D{i // 30:05d}", kapasitas=rng.randrange(20, 120)
+        ))
+
+    tracemalloc.start()
+    awal = tracemalloc.get_traced_memory()[0]
+    rows = [Jadwal(**a) for a in atribut]
+    objek = tracemalloc.get_traced_memory()[0] - awal
+
+    service = ScheduleService()
+    service.import_jadwal(rows)
+    total = tracemalloc.get_traced_memory()[0] - awal
+    tracemalloc.stop()
+
+    per_100k = 100_000 / n / 1024 / 1024
+    print(f"{n} jadwal: objek Jadwal {objek * per_100k:.1f} MiB per 100k, "
+          f"service + indeks {total * per_100k:.1f} MiB per 100k ({len(service.jadwal_list)} tersimpan)")
 
 # ==============================
 # DEMO / MAIN PROGRAM
 # ==============================
 
 if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Modul Jadwal - demo dan benchmark")
+    parser.add_argument("--bench", type=int, metavar="N", help="bandingkan cek konflik linear vs indeks untuk N jadwal")
+    parser.add_argument("--memori", type=int, metavar="N", help="ukur memori N jadwal dengan tracemalloc")
+    args = parser.parse_args()
+    if args.bench or args.memori:
+        if args.bench:
+            benchmark(args.bench)
+        if args.memori:
+            ukur_memori(args.memori)
+        sys.exit()
+
     service = ScheduleService()
 
     # Register observers
@@ -145,3 +571,23 @@ if __name__ == "__main__":
 
     print("\n=== HAPUS JADWAL 1 ===")
     service.delete_jadwal("J001")
+
+    print("\n=== IMPORT MASSAL ===")
+    report = service.import_jadwal([
+        Jadwal("J010", "Basis Data", "Selasa", time(8, 0), time(10, 0), "B201", "Pak Budi", 40),
+        Jadwal("J011", "Algoritma", "Selasa", time(9, 0), time(11, 0), "B201", "Bu Ani", 40),
+        Jadwal("J012", "Statistika", "Selasa", time(9, 30), time(11, 30), "B202", "Pak Budi", 30),
+        Jadwal("J013", "Jaringan", "Rabu", time(8, 0), time(10, 0), "B201", "Bu Ani", 35),
+    ])
+    print(report)
+    for k in report.konflik:
+        print(f"[ERROR] {k}")
+
+    print("\n=== NOTIFIKASI ASYNC ===")
+    service_async = ScheduleService(async_notify=True, batch_size=50)
+    service_async.subject.attach(AdminObserver())
+    for i in range(5):
+        service_async.create_jadwal(
+            Jadwal(f"A{i:03d}", f"Praktikum {i}", "Kamis", time(8 + 2 * i, 0), time(10 + 2 * i, 0), "LAB1", "Bu Ani", 20)
+        )
+    service_async.subject.close()
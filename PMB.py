@@ -1,30 +1,160 @@
- create_engine, Column, Integer, String,
-    DateTime, ForeignKey, Enum
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy import (
+    create_engine, event, inspect, tuple_, Column, Integer, String, Date,
+    DateTime, ForeignKey, Enum, Index, JSON, bindparam, case, delete, func, insert, or_, select, text, union_all, update
 )
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base, relationship, Session
-from pydantic import BaseModel, EmailStr, Field
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field, ValidationError, field_validator
+from collections import Counter, OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta
+from typing import Annotated, Callable, Iterator, Literal, NamedTuple
+import argparse
+import asyncio
+import base64
+import csv
 import enum
+import hashlib
+import importlib
+import io
+import json
+import math
+import os
+import sys
+import threading
+import time
+import zlib
 
 # ======================================================
 # DATABASE SETUP
 # ======================================================
 
-DATABASE_URL = "sqlite:///./pmb.db"
+DATABASE_URL = os.getenv("PMB_DATABASE_URL", "sqlite:///./pmb.db")
 
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# "sync" runs handlers on a blocking Session in the threadpool,
+# "async" gives them an AsyncSession on an async driver.
+DB_MODE = os.getenv("PMB_DB_MODE", "sync")
+
+# Startup, maintenance commands, export, archive, the outbox and group commit
+# always use a blocking engine, so async mode needs both kinds of driver:
+#   sqlite      sync: built-in sqlite3    async: aiosqlite
+#   postgresql  sync: psycopg2            async: asyncpg
+#   postgresql+psycopg                    psycopg 3 for both
+# PMB_DATABASE_URL may name either driver; PMB_SYNC_DATABASE_URL overrides
+# the blocking engine's URL.
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+SYNC_DRIVERS = {
+    "sqlite+aiosqlite": "sqlite",
+    "postgresql+asyncpg": "postgresql",
+}
+
+def _split_url(url: str) -> tuple[str, str]:
+    scheme, rest = url.split("://", 1)
+    if scheme.split("+")[0] == "postgres":
+        scheme = "postgresql" + scheme[len("postgres"):]
+    return scheme, rest
+
+def async_url(url: str) -> str:
+    scheme, rest = _split_url(url)
+    if scheme in SYNC_DRIVERS or scheme == "postgresql+psycopg":
+        return f"{scheme}://{rest}"
+    return f"{ASYNC_DRIVERS.get(scheme.split('+')[0], scheme)}://{rest}"
+
+def sync_url(url: str) -> str:
+    scheme, rest = _split_url(url)
+    return f"{SYNC_DRIVERS.get(scheme, scheme)}://{rest}"
+
+SYNC_DATABASE_URL = os.getenv("PMB_SYNC_DATABASE_URL") or sync_url(DATABASE_URL)
+
+# Applied to every new SQLite connection. WAL lets readers run alongside the
+# single writer, and synchronous=NORMAL only fsyncs at checkpoints, which is
+# durable across application crashes but can lose the last commits on power
+# loss. Group commit (PMB_GROUP_COMMIT=1) promises that a 200 means the row
+# survives either, so it defaults to synchronous=FULL: one fsync per batch.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("PMB_SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv(
+        "PMB_SQLITE_SYNCHRONOUS", "FULL" if os.getenv("PMB_GROUP_COMMIT", "0") == "1" else "NORMAL"
+    ),
+    "busy_timeout": int(os.getenv("PMB_SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "cache_size": int(os.getenv("PMB_SQLITE_CACHE_SIZE", "-65536")),
+    "mmap_size": int(os.getenv("PMB_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "temp_store": "MEMORY",
+}
+
+def _env_int(name: str) -> int | None:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+def engine_options(url: str) -> dict:
+    """Keyword arguments for create_engine / create_async_engine."""
+    if url.startswith("sqlite"):
+        options = {"connect_args": {"check_same_thread": False}}
+        pool_defaults = {}
+    else:
+        options = {"pool_pre_ping": True}
+        pool_defaults = {"pool_size": 10, "max_overflow": 20, "pool_recycle": 1800}
+
+    pool = {
+        "pool_size": _env_int("PMB_POOL_SIZE"),
+        "max_overflow": _env_int("PMB_MAX_OVERFLOW"),
+        "pool_timeout": _env_int("PMB_POOL_TIMEOUT"),
+        "pool_recycle": _env_int("PMB_POOL_RECYCLE"),
+    }
+    options.update(pool_defaults)
+    options.update({k: v for k, v in pool.items() if v is not None})
+    return options
+
+def _set_sqlite_pragmas(dbapi_connection, _connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def configure_engine(sync_engine):
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+    return sync_engine
+
+engine = configure_engine(create_engine(SYNC_DATABASE_URL, **engine_options(SYNC_DATABASE_URL)))
 
 SessionLocal = sessionmaker(bind=engine)
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+if DB_MODE == "async":
+    async_engine = create_async_engine(async_url(DATABASE_URL), **engine_options(DATABASE_URL))
+    configure_engine(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+    async def get_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+else:
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+async def run_db(db: Session | AsyncSession, fn, *args):
+    """Run `fn(session, *args)` without blocking the event loop.
+
+    Service functions are written once against a sync Session; in async
+    mode they run through AsyncSession.run_sync, otherwise in the threadpool.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args)
+    return await run_in_threadpool(fn, db, *args)
 
 # ======================================================
 # MODEL
@@ -57,10 +187,129 @@ class CalonMahasiswa(Base):
     nim = Column(String, unique=True, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     approved_at = Column(DateTime, nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     program_studi_id = Column(Integer, ForeignKey("program_studi.id"))
     program_studi = relationship("ProgramStudi", back_populates="mahasiswa")
 
+    # ORM flushes compare-and-swap on version; set-based updates bump it explicitly.
+    __mapper_args__ = {"version_id_col": version}
+
+    # Keyset pagination of /api/pmb/list walks (created_at, id) under each filter.
+    __table_args__ = (
+        Index("ix_calon_mahasiswa_created", "created_at", "id"),
+        Index("ix_calon_mahasiswa_status_created", "status", "created_at", "id"),
+        Index("ix_calon_mahasiswa_prodi_created", "program_studi_id", "created_at", "id"),
+        Index("ix_calon_mahasiswa_prodi_status_created", "program_studi_id", "status", "created_at", "id"),
+    )
+
+class CalonMahasiswaArsip(Base):
+    """Applicants of past intake years, moved out of calon_mahasiswa by archive_cycles()."""
+    __tablename__ = "calon_mahasiswa_arsip"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    tahun = Column(Integer, nullable=False, index=True)
+    nama_lengkap = Column(String, nullable=False)
+    email = Column(String, nullable=False, index=True)
+    phone = Column(String, nullable=False)
+    alamat = Column(String)
+    status = Column(Enum(StatusEnum))
+    nim = Column(String, index=True)
+    created_at = Column(DateTime)
+    approved_at = Column(DateTime)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    program_studi_id = Column(Integer)
+
+# ======================================================
+# PROGRAM STUDI CATALOG
+# ======================================================
+
+class ProdiInfo(NamedTuple):
+    id: int
+    kode: str
+    nama: str
+    fakultas: str
+
+class ProgramStudiCatalog:
+    """In-memory copy of program_studi used by the validation and approval paths.
+
+    ORM writes to ProgramStudi invalidate it when their transaction commits;
+    writes from other processes or raw SQL are picked up after `ttl` seconds
+    or by calling refresh(). `version` increases on every reload.
+
+    Lookups never wait for the database on TTL expiry: get() keeps serving
+    the stale copy while a single background thread reloads it. An ORM
+    commit instead reloads synchronously in the committing thread, so the
+    new rows are visible by the time commit() returns.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.version = 0
+        self._items: dict[int, ProdiInfo] = {}
+        self._loaded_at = float("-inf")
+        self._lock = threading.Lock()
+        # Guards only the flag, never held across a database query.
+        self._reload_lock = threading.Lock()
+        self._reloading = False
+
+    def refresh(self, db: Session | None = None):
+        query = select(ProgramStudi.id, ProgramStudi.kode, ProgramStudi.nama, ProgramStudi.fakultas)
+        with self._lock:
+            if db is None:
+                with SessionLocal() as own:
+                    rows = own.execute(query).all()
+            else:
+                rows = db.execute(query).all()
+            self._items = {row.id: ProdiInfo(*row) for row in rows}
+            self._loaded_at = time.monotonic()
+            self.version += 1
+
+    def _stale(self) -> bool:
+        return time.monotonic() - self._loaded_at > self.ttl
+
+    def _reload(self):
+        try:
+            # Re-checked here: a refresh() that finished while this thread
+            # was starting makes the reload unnecessary.
+            if self._stale():
+                self.refresh()
+        finally:
+            self._reloading = False
+
+    def refresh_in_background(self):
+        with self._reload_lock:
+            if self._reloading:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload, name="prodi-catalog-reload", daemon=True).start()
+
+    def invalidate(self):
+        # refresh() takes the lock after any TTL reload already running, so
+        # its SELECT always sees the commit that triggered this call.
+        self._loaded_at = float("-inf")
+        self.refresh()
+
+    def get(self, prodi_id: int) -> ProdiInfo | None:
+        if self._stale():
+            self.refresh_in_background()
+        return self._items.get(prodi_id)
+
+    def __contains__(self, prodi_id: int) -> bool:
+        return self.get(prodi_id) is not None
+
+prodi_catalog = ProgramStudiCatalog(ttl=float(os.getenv("PMB_CATALOG_TTL", "300")))
+
+@event.listens_for(Session, "before_flush")
+def _track_prodi_writes(session, flush_context, instances):
+    if any(isinstance(obj, ProgramStudi) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["prodi_changed"] = True
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_prodi_catalog(session):
+    if session.info.pop("prodi_changed", False):
+        prodi_catalog.invalidate()
+
 # ======================================================
 # SCHEMA
 # ======================================================
@@ -72,6 +321,13 @@ class PMBRegister(BaseModel):
     alamat: str | None = None
     program_studi_id: int
 
+    @field_validator("program_studi_id")
+    @classmethod
+    def _prodi_exists(cls, value: int) -> int:
+        if value not in prodi_catalog:
+            raise ValueError("Program studi not found")
+        return value
+
 class PMBResponse(BaseModel):
     id: int
     nama_lengkap: str
@@ -82,99 +338,1756 @@ class PMBResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class PMBListItem(PMBResponse):
+    program_studi_id: int | None
+    created_at: datetime
+    approved_at: datetime | None
+
+class PMBListFilter(BaseModel):
+    status: StatusEnum | None = None
+    program_studi_id: int | None = None
+    created_from: datetime | None = None
+    created_to: datetime | None = None
+    cursor: str | None = None
+    limit: int = Field(50, ge=1, le=500)
+
+class PMBListPage(BaseModel):
+    items: list[PMBListItem]
+    next_cursor: str | None
+
+class BatchRowResult(BaseModel):
+    row: int
+    status: str
+    email: str | None = None
+    id: int | None = None
+    detail: str | None = None
+
+class PMBBatchReport(BaseModel):
+    accepted: int = 0
+    duplicate: int = 0
+    invalid: int = 0
+    rows: list[BatchRowResult] = []
+
+class PMBBulkApprove(BaseModel):
+    program_studi_id: int
+    ids: list[int] | None = None
+    created_from: datetime | None = None
+    created_to: datetime | None = None
+
+class PMBBulkApproveResult(BaseModel):
+    approved: int
+    nim_awal: str | None = None
+    nim_akhir: str | None = None
+
 # ======================================================
 # NIM GENERATOR
 # ======================================================
 
-def generate_nim(tahun: int, kode_prodi: str, db: Session) -> str:
-    prefix = f"{tahun}{kode_prodi}"
+class NimSequence(Base):
+    __tablename__ = "nim_sequence"
+
+    tahun = Column(Integer, primary_key=True)
+    kode_prodi = Column(String(3), primary_key=True)
+    last_number = Column(Integer, nullable=False, default=0)
 
+def _last_issued_number(prefix: str, db: Session) -> int:
+    # Only used once per (tahun, kode_prodi) to seed the sequence from
+    # NIMs issued before the sequence table existed.
     last = (
-        db.query(CalonMahasiswa)
+        db.query(CalonMahasiswa.nim)
         .filter(CalonMahasiswa.nim.like(f"{prefix}%"))
         .order_by(CalonMahasiswa.nim.desc())
         .first()
     )
+    return int(last.nim[-4:]) if last and last.nim else 0
+
+def allocate_nim(tahun: int, kode_prodi: str, db: Session, count: int = 1) -> int:
+    """Reserve `count` consecutive numbers and return the first one.
+
+    The increment is a single UPDATE, so the write lock taken by the
+    database serializes allocations across threads and worker processes.
+    The reservation commits or rolls back with the caller's transaction.
+    """
+    bump = (
+        update(NimSequence)
+        .where(NimSequence.tahun == tahun, NimSequence.kode_prodi == kode_prodi)
+        .values(last_number=NimSequence.last_number + count)
+        .returning(NimSequence.last_number)
+    )
+
+    while True:
+        last_number = db.execute(bump).scalar_one_or_none()
+        if last_number is not None:
+            return last_number - count + 1
+
+        seed = _last_issued_number(f"{tahun}{kode_prodi}", db)
+        try:
+            with db.begin_nested():
+                db.add(NimSequence(tahun=tahun, kode_prodi=kode_prodi, last_number=seed))
+        except IntegrityError:
+            # Another worker created the row first; retry the UPDATE.
+            pass
+
+def format_nim(tahun: int, kode_prodi: str, number: int) -> str:
+    return f"{tahun}{kode_prodi}{str(number).zfill(4)}"
+
+def generate_nim(tahun: int, kode_prodi: str, db: Session) -> str:
+    return format_nim(tahun, kode_prodi, allocate_nim(tahun, kode_prodi, db))
+
+# ======================================================
+# ADMISSION COUNTERS
+# ======================================================
+
+class PMBCounter(Base):
+    __tablename__ = "pmb_counter"
+
+    program_studi_id = Column(Integer, primary_key=True)
+    tanggal = Column(Date, primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+    pending = Column(Integer, nullable=False, default=0)
+    approved = Column(Integer, nullable=False, default=0)
+    # Incremented by every bump_counter on this row; see PMBCounterEpoch.
+    revisi = Column(Integer, nullable=False, default=0, server_default="0")
+
+class PMBCounterEpoch(Base):
+    """Single row bumped whenever pmb_counter rows are removed.
+
+    The statistics ETag is (epoch, SUM(pmb_counter.revisi)). Ordinary writes
+    only raise a row's `revisi`, so the sum grows with every change; the rare
+    admin paths that delete counter rows (rebuild, archive) bump the epoch
+    instead, so the pair never repeats. Registrations and approvals never
+    touch this row, which keeps it from becoming a global lock.
+    """
+    __tablename__ = "pmb_counter_epoch"
+
+    id = Column(Integer, primary_key=True)
+    epoch = Column(Integer, nullable=False, default=0)
+
+def bump_counter_epoch(db: Session):
+    stmt = update(PMBCounterEpoch).where(PMBCounterEpoch.id == 1).values(epoch=PMBCounterEpoch.epoch + 1)
+    while not db.execute(stmt).rowcount:
+        try:
+            with db.begin_nested():
+                db.add(PMBCounterEpoch(id=1, epoch=0))
+        except IntegrityError:
+            pass
+
+def bump_counter(db: Session, program_studi_id: int, tanggal: date, **delta: int):
+    """Add `delta` to the (program_studi_id, tanggal) counter row.
+
+    Must run inside the transaction that changes `calon_mahasiswa` so the
+    counters commit or roll back together with the applicant rows.
+    """
+    stmt = (
+        update(PMBCounter)
+        .where(PMBCounter.program_studi_id == program_studi_id, PMBCounter.tanggal == tanggal)
+        .values({
+            PMBCounter.revisi: PMBCounter.revisi + 1,
+            **{getattr(PMBCounter, k): getattr(PMBCounter, k) + v for k, v in delta.items()},
+        })
+    )
+
+    while not db.execute(stmt).rowcount:
+        try:
+            with db.begin_nested():
+                db.add(PMBCounter(
+                    program_studi_id=program_studi_id, tanggal=tanggal,
+                    total=0, pending=0, approved=0, revisi=0
+                ))
+        except IntegrityError:
+            pass
+
+def rebuild_counters(db: Session):
+    bump_counter_epoch(db)
+    db.execute(delete(PMBCounter))
+    db.execute(
+        insert(PMBCounter).from_select(
+            ["program_studi_id", "tanggal", "total", "pending", "approved"],
+            select(
+                CalonMahasiswa.program_studi_id,
+                func.date(CalonMahasiswa.created_at),
+                func.count(),
+                func.sum(case((CalonMahasiswa.status == StatusEnum.pending, 1), else_=0)),
+                func.sum(case((CalonMahasiswa.status == StatusEnum.approved, 1), else_=0)),
+            )
+            .where(CalonMahasiswa.program_studi_id.is_not(None))
+            .group_by(CalonMahasiswa.program_studi_id, func.date(CalonMahasiswa.created_at))
+        )
+    )
+    db.commit()
+
+# ======================================================
+# OUTBOX
+# ======================================================
+
+EVENT_REGISTERED = "pmb.registered"
+EVENT_APPROVED = "pmb.approved"
+
+# Comma-separated events written to pmb_outbox, e.g. "pmb.registered,pmb.approved".
+# Off by default: an event nobody consumes would only grow the table. Every
+# event listed here needs a handler in the dispatcher or outbox-worker.
+OUTBOX_EVENTS = {e.strip() for e in os.getenv("PMB_OUTBOX_EVENTS", "").split(",") if e.strip()}
+OUTBOX_DISPATCH = os.getenv("PMB_OUTBOX_DISPATCH", "1") == "1"
+# Comma-separated modules that register handlers with @outbox_handler.
+OUTBOX_HANDLER_MODULES = [m.strip() for m in os.getenv("PMB_OUTBOX_HANDLERS", "").split(",") if m.strip()]
+OUTBOX_BATCH_SIZE = int(os.getenv("PMB_OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_POLL_MS = float(os.getenv("PMB_OUTBOX_POLL_MS", "500"))
+OUTBOX_LEASE_SECONDS = float(os.getenv("PMB_OUTBOX_LEASE_SECONDS", "60"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("PMB_OUTBOX_MAX_ATTEMPTS", "10"))
+OUTBOX_RETRY_BASE_SECONDS = 2.0
+OUTBOX_RETRY_MAX_SECONDS = 600.0
+
+class PMBOutbox(Base):
+    __tablename__ = "pmb_outbox"
+
+    id = Column(Integer, primary_key=True)
+    event = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    attempts = Column(Integer, nullable=False, default=0)
+    # Next time the row may be claimed: now for new events, the lease expiry
+    # while a dispatcher holds it, the backoff after a failure. NULL once
+    # OUTBOX_MAX_ATTEMPTS is exhausted (dead letter).
+    available_at = Column(DateTime, nullable=True, index=True)
+    last_error = Column(String, nullable=True)
+
+def emit_events(db: Session, event_name: str, payloads: list[dict]):
+    """Queue events in the caller's transaction; they exist only if it commits.
+
+    Events not enabled in PMB_OUTBOX_EVENTS are dropped without a write.
+    """
+    if payloads and event_name in OUTBOX_EVENTS:
+        now = datetime.utcnow()
+        db.execute(
+            insert(PMBOutbox),
+            [{"event": event_name, "payload": p, "created_at": now, "attempts": 0, "available_at": now}
+             for p in payloads]
+        )
+
+OutboxHandler = Callable[[dict], None]
+outbox_handlers: dict[str, list[OutboxHandler]] = {}
+outbox_stats: Counter = Counter()
+
+def outbox_handler(event_name: str):
+    """Register a handler for `event_name`.
+
+    Delivery is at-least-once: a handler may see the same event again after a
+    crash, an expired lease, or a failure in another handler of the same
+    event, so handlers must be idempotent (e.g. keyed on payload["id"]).
+    """
+    def register(fn: OutboxHandler) -> OutboxHandler:
+        outbox_handlers.setdefault(event_name, []).append(fn)
+        return fn
+    return register
+
+def load_outbox_handlers(modules: list[str]):
+    """Import the modules that register outbox handlers."""
+    # Handler modules do `from PMB import outbox_handler`; when this file runs
+    # as a script that must resolve to this module, not a second copy.
+    sys.modules.setdefault("PMB", sys.modules[__name__])
+    for module in modules:
+        importlib.import_module(module)
+
+def dispatch_outbox(batch_size: int = OUTBOX_BATCH_SIZE, lease_seconds: float = OUTBOX_LEASE_SECONDS) -> int:
+    """Claim up to `batch_size` due events, run their handlers, record the outcome.
+
+    Only events that have a registered handler are claimed; the rest stay in
+    pmb_outbox until a dispatcher that knows them runs. Claiming pushes
+    available_at past the lease in one UPDATE, so concurrent dispatchers
+    (several workers, or the outbox-worker process) never pick the same row
+    while the lease holds. Returns the number of rows claimed.
+    """
+    if not outbox_handlers:
+        return 0
+    now = datetime.utcnow()
+    due = (
+        select(PMBOutbox.id)
+        .where(PMBOutbox.available_at <= now, PMBOutbox.event.in_(list(outbox_handlers)))
+        .order_by(PMBOutbox.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    claim = (
+        update(PMBOutbox)
+        .where(PMBOutbox.id.in_(due))
+        .values(available_at=now + timedelta(seconds=lease_seconds), attempts=PMBOutbox.attempts + 1)
+        .returning(PMBOutbox.id, PMBOutbox.event, PMBOutbox.payload, PMBOutbox.attempts)
+    )
+    with SessionLocal() as db:
+        claimed = db.execute(claim).all()
+        db.commit()
+        if not claimed:
+            return 0
+
+        delivered, failed = [], []
+        for row in sorted(claimed):
+            try:
+                for handler in outbox_handlers.get(row.event, ()):
+                    handler(row.payload)
+            except Exception as e:
+                if row.attempts >= OUTBOX_MAX_ATTEMPTS:
+                    retry_at = None
+                else:
+                    delay = min(OUTBOX_RETRY_BASE_SECONDS * 2 ** (row.attempts - 1), OUTBOX_RETRY_MAX_SECONDS)
+                    retry_at = datetime.utcnow() + timedelta(seconds=delay)
+                failed.append({"_id": row.id, "_at": retry_at, "_error": repr(e)[:500]})
+            else:
+                delivered.append(row.id)
+
+        if delivered:
+            db.execute(delete(PMBOutbox).where(PMBOutbox.id.in_(delivered)))
+        if failed:
+            db.connection().execute(
+                update(PMBOutbox)
+                .where(PMBOutbox.id == bindparam("_id"))
+                .values(available_at=bindparam("_at"), last_error=bindparam("_error")),
+                failed
+            )
+        db.commit()
+
+    outbox_stats["delivered"] += len(delivered)
+    outbox_stats["failed"] += len(failed)
+    outbox_stats["dead"] += sum(f["_at"] is None for f in failed)
+    return len(claimed)
+
+class OutboxDispatcher:
+    """Background task that drains pmb_outbox while the app is running.
+
+    Handlers run in the threadpool, off the request path; a full batch is
+    followed immediately by the next one, otherwise the task polls every
+    `poll_ms`.
+    """
+
+    def __init__(self, poll_ms: float, batch_size: int):
+        self.poll = poll_ms / 1000
+        self.batch_size = batch_size
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Events claimed by an interrupted batch are picked up again once
+        # their lease expires.
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self):
+        while True:
+            try:
+                claimed = await run_in_threadpool(dispatch_outbox, self.batch_size)
+            except Exception:
+                # Keep polling (the database may come back), but make a
+                # persistent failure visible on /metrics.
+                outbox_stats["dispatch_errors"] += 1
+                claimed = 0
+            if claimed < self.batch_size:
+                await asyncio.sleep(self.poll)
+
+outbox_dispatcher = OutboxDispatcher(OUTBOX_POLL_MS, OUTBOX_BATCH_SIZE) if OUTBOX_DISPATCH else None
+
+# ======================================================
+# STATUS CACHE
+# ======================================================
+
+class CacheBackend:
+    """Storage for serialized responses; subclass it to use an external store."""
+
+    def get(self, key: str) -> bytes | None:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: float):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU with per-entry expiry."""
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._data: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+class StatusCache:
+    """Serialized PMBResponse payloads and their ETag, keyed by mahasiswa id.
+
+    Entries are invalidated by every mutation in this process; the TTL bounds
+    staleness for mutations made by other worker processes.
+
+    A read-through fill registers itself with `begin_fill` before it reads the
+    database. `invalidate` cancels the fills in flight for that id, so a
+    payload read before a mutation committed is never stored after the
+    mutation's invalidation.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._fills: dict[int, set[object]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(mahasiswa_id: int) -> str:
+        return f"pmb:status:{mahasiswa_id}"
+
+    def get(self, mahasiswa_id: int) -> tuple[str, bytes] | None:
+        entry = self.backend.get(self._key(mahasiswa_id))
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        etag, payload = entry.split(b"\n", 1)
+        return etag.decode(), payload
+
+    def begin_fill(self, mahasiswa_id: int) -> object:
+        token = object()
+        with self._lock:
+            self._fills.setdefault(mahasiswa_id, set()).add(token)
+        return token
+
+    def end_fill(self, mahasiswa_id: int, token: object):
+        with self._lock:
+            tokens = self._fills.get(mahasiswa_id)
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self._fills[mahasiswa_id]
+
+    def set(self, mahasiswa_id: int, etag: str, payload: bytes, fill: object | None = None):
+        with self._lock:
+            if fill is not None and fill not in self._fills.get(mahasiswa_id, ()):
+                return
+            self.backend.set(self._key(mahasiswa_id), etag.encode() + b"\n" + payload, self.ttl)
+
+    def invalidate(self, *mahasiswa_ids: int):
+        with self._lock:
+            for mahasiswa_id in mahasiswa_ids:
+                self._fills.pop(mahasiswa_id, None)
+                self.backend.delete(self._key(mahasiswa_id))
+
+status_cache = StatusCache(
+    MemoryCacheBackend(maxsize=int(os.getenv("PMB_STATUS_CACHE_SIZE", "10000"))),
+    ttl=float(os.getenv("PMB_STATUS_CACHE_TTL", "30")),
+)
+
+# ======================================================
+# EMAIL FILTER
+# ======================================================
+
+class EmailBloomFilter:
+    """Bloom filter of registered emails.
+
+    A negative answer is definite, so new emails go straight to the INSERT
+    without a lookup. A positive answer may be false, so it is confirmed
+    with an indexed SELECT before rejecting; the unique index on email
+    stays the source of truth.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, email: str):
+        digest = hashlib.blake2b(email.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, email: str):
+        for pos in self._positions(email):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, email: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(email))
+
+    def load(self, db: Session):
+        emails = db.scalars(
+            select(CalonMahasiswa.email).execution_options(yield_per=10000)
+        )
+        for email in emails:
+            self.add(email)
+
+email_filter = EmailBloomFilter(capacity=int(os.getenv("PMB_EMAIL_FILTER_CAPACITY", "1000000")))
+
+def is_duplicate_email(exc: IntegrityError) -> bool:
+    return "email" in str(exc.orig)
+
+# ======================================================
+# BATCH REGISTRATION
+# ======================================================
+
+BATCH_CHUNK_SIZE = 1000
+
+async def _iter_lines(request: Request):
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8-sig").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8-sig").rstrip("\r")
+
+async def _iter_csv_rows(request: Request):
+    # A quoted field (alamat) may span several physical lines; lines are
+    # buffered until the quotes balance and then parsed as one record.
+    pending: list[str] = []
+    async for line in _iter_lines(request):
+        if not pending and not line.strip():
+            continue
+        pending.append(line)
+        text = "\n".join(pending)
+        if text.count('"') % 2:
+            continue
+        pending = []
+        yield next(csv.reader(io.StringIO(text)))
+    if pending:
+        raise ValueError("unterminated quoted field")
+
+async def _iter_records(request: Request):
+    """Yield (row_number, dict | None, error) from an NDJSON or CSV body."""
+    row = 0
+
+    if "csv" in request.headers.get("content-type", ""):
+        header = None
+        rows = _iter_csv_rows(request)
+        while True:
+            try:
+                values = await anext(rows)
+            except StopAsyncIteration:
+                return
+            except ValueError as e:
+                yield row + 1, None, str(e)
+                return
+            if header is None:
+                header = values
+                continue
+            row += 1
+            yield row, {k: v for k, v in zip(header, values) if v != ""}, None
+
+    async for line in _iter_lines(request):
+        if not line.strip():
+            continue
+
+        row += 1
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("row must be a JSON object")
+        except ValueError as e:
+            yield row, None, str(e)
+            continue
+        yield row, record, None
+
+def _validation_detail(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+    )
+
+def _insert_chunk(db: Session, chunk: list[tuple[int, PMBRegister]], seen: set[str]) -> list[BatchRowResult]:
+    emails = [data.email for _, data in chunk]
+    existing = set(
+        db.scalars(select(CalonMahasiswa.email).where(CalonMahasiswa.email.in_(emails)))
+    )
+
+    now = datetime.utcnow()
+    results: dict[int, BatchRowResult] = {}
+    pending: list[tuple[int, dict]] = []
+    for row, data in chunk:
+        if data.email in existing or data.email in seen:
+            results[row] = BatchRowResult(row=row, status="duplicate", email=data.email)
+            continue
+        seen.add(data.email)
+        pending.append((row, {**data.model_dump(), "created_at": now}))
+
+    if pending:
+        stmt = insert(CalonMahasiswa).returning(
+            CalonMahasiswa.id, sort_by_parameter_order=True
+        )
+        try:
+            ids = db.scalars(stmt, [values for _, values in pending]).all()
+        except IntegrityError:
+            # A concurrent registration took one of the emails between the
+            # lookup and the insert; fall back to row-by-row savepoints.
+            db.rollback()
+            ids = []
+            for _, values in pending:
+                try:
+                    with db.begin_nested():
+                        ids.append(db.scalar(stmt, values))
+                except IntegrityError:
+                    ids.append(None)
+
+        per_prodi = Counter(
+            values["program_studi_id"] for (_, values), new_id in zip(pending, ids) if new_id is not None
+        )
+        for program_studi_id, n in per_prodi.items():
+            bump_counter(db, program_studi_id, now.date(), total=n, pending=n)
+        emit_events(db, EVENT_REGISTERED, [
+            {"id": new_id, "email": values["email"], "program_studi_id": values["program_studi_id"]}
+            for (_, values), new_id in zip(pending, ids) if new_id is not None
+        ])
+        db.commit()
+
+        for (row, values), new_id in zip(pending, ids):
+            if new_id is None:
+                results[row] = BatchRowResult(row=row, status="duplicate", email=values["email"])
+            else:
+                email_filter.add(values["email"])
+                results[row] = BatchRowResult(row=row, status="accepted", email=values["email"], id=new_id)
+
+    return [results[row] for row, _ in chunk]
+
+# ======================================================
+# GROUP COMMIT
+# ======================================================
+
+GROUP_COMMIT = os.getenv("PMB_GROUP_COMMIT", "0") == "1"
+GROUP_COMMIT_INTERVAL_MS = float(os.getenv("PMB_GROUP_COMMIT_INTERVAL_MS", "5"))
+GROUP_COMMIT_MAX_ROWS = int(os.getenv("PMB_GROUP_COMMIT_MAX_ROWS", "500"))
+
+class RegistrationWriter:
+    """Write-behind queue that commits many registrations in one transaction.
+
+    Requests wait on a future that resolves only after the transaction
+    holding their row has committed. On SQLite that commit is fsynced
+    (synchronous=FULL is the default when group commit is on), so a 200
+    means the row survives a power loss; setting PMB_SQLITE_SYNCHRONOUS=NORMAL
+    weakens that to surviving application crashes only. A batch is flushed every `interval_ms` or once `max_rows`
+    registrations are waiting, whichever comes first.
+    """
+
+    def __init__(self, interval_ms: float, max_rows: int):
+        self.interval = interval_ms / 1000
+        self.max_rows = max_rows
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        remaining = []
+        while not self._queue.empty():
+            remaining.append(self._queue.get_nowait())
+        if remaining:
+            await self._flush(remaining)
+
+    async def submit(self, data: PMBRegister) -> PMBResponse:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((data, future))
+        return await future
 
-    if last and last.nim:
-        last_number = int(last.nim[-4:])
-        new_number = last_number + 1
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            if self._queue.qsize() < self.max_rows - 1:
+                await asyncio.sleep(self.interval)
+            while not self._queue.empty() and len(batch) < self.max_rows:
+                batch.append(self._queue.get_nowait())
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[tuple[PMBRegister, asyncio.Future]]):
+        try:
+            results = await run_in_threadpool(_register_group, [data for data, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (data, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if result.status == "accepted":
+                future.set_result(PMBResponse(
+                    id=result.id, nama_lengkap=data.nama_lengkap, email=data.email,
+                    status=StatusEnum.pending.value, nim=None
+                ))
+            else:
+                future.set_exception(HTTPException(status_code=409, detail="Email already registered"))
+
+def _register_group(batch: list[PMBRegister]) -> list[BatchRowResult]:
+    # Within a batch the first registration of an email wins, exactly as if
+    # the requests had been committed one by one in arrival order.
+    with SessionLocal() as db:
+        return _insert_chunk(db, list(enumerate(batch)), set())
+
+registration_writer = (
+    RegistrationWriter(GROUP_COMMIT_INTERVAL_MS, GROUP_COMMIT_MAX_ROWS) if GROUP_COMMIT else None
+)
+
+# ======================================================
+# ARCHIVE
+# ======================================================
+
+def archive_cycles(tahun_aktif: int, batch_size: int = 1000, pause: float = 0.01) -> int:
+    """Move applicants registered before `tahun_aktif` to calon_mahasiswa_arsip.
+
+    Rows move in small transactions (copy, delete, adjust pmb_counter) with a
+    short pause in between, so registrations keep getting the write lock
+    while the archive runs. Returns the number of rows moved.
+    """
+    cutoff = datetime(tahun_aktif, 1, 1)
+    moved = 0
+
+    with SessionLocal() as db:
+        # SQLite hands out max(id) + 1 for new rows; keeping the newest row in
+        # place guarantees archived ids are never reused by the active table.
+        keep_id = db.scalar(select(func.max(CalonMahasiswa.id)))
+        query = (
+            select(CalonMahasiswa.__table__)
+            .where(CalonMahasiswa.created_at < cutoff, CalonMahasiswa.id != keep_id)
+            .order_by(CalonMahasiswa.id)
+            .limit(batch_size)
+        )
+
+        while rows := db.execute(query).mappings().all():
+            db.execute(
+                insert(CalonMahasiswaArsip),
+                [{**row, "tahun": row["created_at"].year} for row in rows]
+            )
+            db.execute(delete(CalonMahasiswa).where(CalonMahasiswa.id.in_([row["id"] for row in rows])))
+
+            deltas: dict[tuple, Counter] = {}
+            for row in rows:
+                if row["program_studi_id"] is None:
+                    continue
+                key = (row["program_studi_id"], row["created_at"].date())
+                deltas.setdefault(key, Counter())["total"] -= 1
+                if row["status"] in (StatusEnum.pending, StatusEnum.approved):
+                    deltas[key][row["status"].value] -= 1
+            for (program_studi_id, tanggal), delta in deltas.items():
+                bump_counter(db, program_studi_id, tanggal, **delta)
+            if db.execute(delete(PMBCounter).where(PMBCounter.total == 0, PMBCounter.tanggal < cutoff.date())).rowcount:
+                bump_counter_epoch(db)
+
+            db.commit()
+            moved += len(rows)
+            time.sleep(pause)
+
+    return moved
+
+# ======================================================
+# EXPORT
+# ======================================================
+
+EXPORT_BATCH_SIZE = 5000
+EXPORT_COLUMNS = [
+    CalonMahasiswa.id, CalonMahasiswa.nama_lengkap, CalonMahasiswa.email,
+    CalonMahasiswa.phone, CalonMahasiswa.alamat, CalonMahasiswa.status,
+    CalonMahasiswa.nim, CalonMahasiswa.created_at, CalonMahasiswa.approved_at,
+    CalonMahasiswa.program_studi_id,
+    ProgramStudi.kode.label("kode_prodi"),
+    ProgramStudi.nama.label("nama_prodi"),
+    ProgramStudi.fakultas,
+]
+EXPORT_FIELDS = [c.key for c in EXPORT_COLUMNS]
+# The same columns taken from calon_mahasiswa_arsip, for exports that include archived cycles.
+EXPORT_ARSIP_COLUMNS = [
+    getattr(CalonMahasiswaArsip, c.key) if c.table is CalonMahasiswa.__table__ else c
+    for c in EXPORT_COLUMNS
+]
+
+def _export_value(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def iter_export(
+    fmt: Literal["csv", "ndjson"] = "csv", compress: bool = False, arsip: bool = False
+) -> Iterator[bytes]:
+    """Stream every applicant joined with its program studi.
+
+    Only calon_mahasiswa is read unless `arsip` is set; then applicants moved
+    to calon_mahasiswa_arsip by archive_cycles() are included as well.
+    Rows come from a server-side cursor EXPORT_BATCH_SIZE at a time and each
+    batch is encoded (and optionally gzipped) before the next one is fetched,
+    so memory stays flat regardless of table size.
+    """
+    query = (
+        select(*EXPORT_COLUMNS)
+        .outerjoin(ProgramStudi, CalonMahasiswa.program_studi_id == ProgramStudi.id)
+    )
+    if arsip:
+        semua = union_all(query, (
+            select(*EXPORT_ARSIP_COLUMNS)
+            .outerjoin(ProgramStudi, CalonMahasiswaArsip.program_studi_id == ProgramStudi.id)
+        )).subquery()
+        query = select(*semua.c).order_by(semua.c.id)
     else:
-        new_number = 1
+        query = query.order_by(CalonMahasiswa.id)
+    query = query.execution_options(yield_per=EXPORT_BATCH_SIZE)
+    gzip = zlib.compressobj(wbits=31) if compress else None
+
+    def emit(data: bytes) -> bytes:
+        return gzip.compress(data) if gzip else data
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == "csv":
+        writer.writerow(EXPORT_FIELDS)
+
+    with SessionLocal() as db:
+        for partition in db.execute(query).partitions():
+            for row in partition:
+                values = [_export_value(v) for v in row]
+                if fmt == "csv":
+                    writer.writerow(values)
+                else:
+                    buffer.write(json.dumps(dict(zip(EXPORT_FIELDS, values))))
+                    buffer.write("\n")
+            chunk = emit(buffer.getvalue().encode())
+            buffer.seek(0)
+            buffer.truncate()
+            if chunk:
+                yield chunk
+
+    tail = emit(buffer.getvalue().encode())
+    if gzip:
+        tail += gzip.flush()
+    if tail:
+        yield tail
+
+# ======================================================
+# METRICS
+# ======================================================
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_HEADER = os.getenv("PMB_QUERY_COUNT_HEADER", "0") == "1"
+
+class RequestStats:
+    __slots__ = ("statements", "sql_seconds", "commits", "commit_seconds", "_commit_started")
+
+    def __init__(self):
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.commits = 0
+        self.commit_seconds = 0.0
+        self._commit_started = None
+
+# Set per request by the middleware; the object is shared with the threadpool
+# and run_sync greenlets that execute the handler's queries.
+request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: Counter = Counter()
+        self.latency: dict[tuple, Histogram] = {}
+        self.db: dict[tuple, Counter] = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        with self._lock:
+            self.requests[(method, route, str(status))] += 1
+            self.latency.setdefault((method, route), Histogram()).observe(seconds)
+            self.db.setdefault((method, route), Counter()).update({
+                "statements": stats.statements,
+                "statement_seconds": stats.sql_seconds,
+                "commits": stats.commits,
+                "commit_seconds": stats.commit_seconds,
+            })
+
+    @staticmethod
+    def _labels(**labels) -> str:
+        return ",".join(f'{k}="{v}"' for k, v in labels.items())
+
+    def render(self) -> str:
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            family("pmb_http_requests_total", "counter", "HTTP requests by route and status.")
+            for (method, route, status), n in sorted(self.requests.items()):
+                lines.append(f"pmb_http_requests_total{{{self._labels(method=method, route=route, status=status)}}} {n}")
+
+            family("pmb_http_request_duration_seconds", "histogram", "HTTP request latency.")
+            for (method, route), h in sorted(self.latency.items()):
+                labels = self._labels(method=method, route=route)
+                for bound, n in zip(h.buckets, h.counts):
+                    lines.append(f'pmb_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {n}')
+                lines.append(f'pmb_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {h.count}')
+                lines.append(f"pmb_http_request_duration_seconds_sum{{{labels}}} {h.sum}")
+                lines.append(f"pmb_http_request_duration_seconds_count{{{labels}}} {h.count}")
+
+            for key, kind, help_text in (
+                ("statements", "counter", "SQL statements executed."),
+                ("statement_seconds", "counter", "Time spent executing SQL statements."),
+                ("commits", "counter", "Transactions committed."),
+                ("commit_seconds", "counter", "Time spent committing transactions."),
+            ):
+                name = f"pmb_db_{key}_total"
+                family(name, kind, help_text)
+                for (method, route), counts in sorted(self.db.items()):
+                    lines.append(f"{name}{{{self._labels(method=method, route=route)}}} {counts[key]}")
+
+        family("pmb_status_cache_hits_total", "counter", "Status cache hits.")
+        lines.append(f"pmb_status_cache_hits_total {status_cache.hits}")
+        family("pmb_status_cache_misses_total", "counter", "Status cache misses.")
+        lines.append(f"pmb_status_cache_misses_total {status_cache.misses}")
+        if admission is not None:
+            family("pmb_admission_rejected_total", "counter", "Requests rejected with 429.")
+            for reason, n in sorted(admission.rejected.items()):
+                lines.append(f'pmb_admission_rejected_total{{reason="{reason}"}} {n}')
+            family("pmb_admission_active", "gauge", "Requests holding a concurrency slot.")
+            lines.append(f"pmb_admission_active {admission.active}")
+        family("pmb_outbox_events_total", "counter", "Outbox events processed by this process.")
+        for outcome in ("delivered", "failed", "dead"):
+            lines.append(f'pmb_outbox_events_total{{outcome="{outcome}"}} {outbox_stats[outcome]}')
+        family("pmb_outbox_dispatch_errors_total", "counter", "Outbox dispatch batches that raised.")
+        lines.append(f"pmb_outbox_dispatch_errors_total {outbox_stats['dispatch_errors']}")
+        family("pmb_prodi_catalog_version", "gauge", "Reloads of the program studi catalog.")
+        lines.append(f"pmb_prodi_catalog_version {prodi_catalog.version}")
+        return "\n".join(lines) + "\n"
 
-    return f"{prefix}{str(new_number).zfill(4)}"
+metrics = Metrics()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # The start time lives on the per-statement execution context, so a
+    # statement that raises (and never reaches after_cursor_execute) leaves
+    # nothing behind on the long-lived pooled connection.
+    if context is not None:
+        context._pmb_query_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_pmb_query_started", None)
+    stats = request_stats.get()
+    if stats is not None and started is not None:
+        stats.statements += 1
+        stats.sql_seconds += time.perf_counter() - started
+
+def _before_commit(conn):
+    stats = request_stats.get()
+    if stats is not None:
+        stats._commit_started = time.perf_counter()
+
+def _after_commit(session):
+    stats = request_stats.get()
+    if stats is not None and stats._commit_started is not None:
+        stats.commits += 1
+        stats.commit_seconds += time.perf_counter() - stats._commit_started
+        stats._commit_started = None
+
+def instrument_engine(sync_engine):
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "commit", _before_commit)
+    return sync_engine
+
+instrument_engine(engine)
+if DB_MODE == "async":
+    instrument_engine(async_engine.sync_engine)
+event.listen(Session, "after_commit", _after_commit)
+
+# ======================================================
+# SEARCH INDEX
+# ======================================================
+
+SEARCH_COLUMNS = ("nama_lengkap", "alamat", "email", "phone")
+
+# External-content FTS5 table over calon_mahasiswa. The trigram tokenizer
+# matches any substring of 3+ characters, which covers partial names and
+# phone numbers; triggers keep it in sync with every write path, including
+# Core bulk inserts and archival deletes.
+SEARCH_INDEX_DDL = [
+    """
+    CREATE VIRTUAL TABLE calon_mahasiswa_fts USING fts5(
+        nama_lengkap, alamat, email, phone,
+        content='calon_mahasiswa', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER calon_mahasiswa_fts_ai AFTER INSERT ON calon_mahasiswa BEGIN
+        INSERT INTO calon_mahasiswa_fts(rowid, nama_lengkap, alamat, email, phone)
+        VALUES (new.id, new.nama_lengkap, new.alamat, new.email, new.phone);
+    END
+    """,
+    """
+    CREATE TRIGGER calon_mahasiswa_fts_ad AFTER DELETE ON calon_mahasiswa BEGIN
+        INSERT INTO calon_mahasiswa_fts(calon_mahasiswa_fts, rowid, nama_lengkap, alamat, email, phone)
+        VALUES ('delete', old.id, old.nama_lengkap, old.alamat, old.email, old.phone);
+    END
+    """,
+    """
+    CREATE TRIGGER calon_mahasiswa_fts_au AFTER UPDATE OF nama_lengkap, alamat, email, phone
+    ON calon_mahasiswa BEGIN
+        INSERT INTO calon_mahasiswa_fts(calon_mahasiswa_fts, rowid, nama_lengkap, alamat, email, phone)
+        VALUES ('delete', old.id, old.nama_lengkap, old.alamat, old.email, old.phone);
+        INSERT INTO calon_mahasiswa_fts(rowid, nama_lengkap, alamat, email, phone)
+        VALUES (new.id, new.nama_lengkap, new.alamat, new.email, new.phone);
+    END
+    """,
+]
+
+SEARCH_SQL = """
+    SELECT calon_mahasiswa.* FROM calon_mahasiswa_fts
+    JOIN calon_mahasiswa ON calon_mahasiswa.id = calon_mahasiswa_fts.rowid
+    WHERE calon_mahasiswa_fts MATCH :query
+    ORDER BY calon_mahasiswa_fts.rank
+    LIMIT :limit
+"""
+
+def create_search_index(bind):
+    if bind.dialect.name != "sqlite":
+        return
+    with bind.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'calon_mahasiswa_fts'")
+        ).first()
+        if exists:
+            return
+        for ddl in SEARCH_INDEX_DDL:
+            conn.execute(text(ddl))
+        conn.execute(text("INSERT INTO calon_mahasiswa_fts(calon_mahasiswa_fts) VALUES ('rebuild')"))
+
+def _fts_query(q: str) -> str:
+    # Every term becomes a quoted phrase, so user input cannot inject FTS5
+    # operators and all terms must match (implicit AND).
+    return " ".join('"' + term.replace('"', '""') + '"' for term in q.split())
+
+# ======================================================
+# ADMISSION CONTROL
+# ======================================================
+
+ADMISSION_CONTROL = os.getenv("PMB_ADMISSION_CONTROL", "0") == "1"
+TRUST_FORWARDED_FOR = os.getenv("PMB_TRUST_FORWARDED_FOR", "0") == "1"
+
+def _parse_rate(value: str) -> tuple[float, float]:
+    """'rate/burst' in requests per second, e.g. '2/10'."""
+    rate, burst = value.split("/")
+    return float(rate), float(burst)
+
+# Matched by path prefix; each client IP gets its own bucket per prefix.
+ROUTE_RATE_LIMITS = {
+    "/api/pmb/register": _parse_rate(os.getenv("PMB_RATE_REGISTER", "1/5")),
+    "/api/pmb/status/": _parse_rate(os.getenv("PMB_RATE_STATUS", "5/20")),
+}
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Consume one token; return 0 on success or seconds until one is available."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class AdmissionController:
+    """Per-client rate limits plus a global concurrency limit with a bounded queue.
+
+    All state is touched only from the event loop thread, so no locking is
+    needed and each admission check is a few dictionary operations.
+    """
+
+    def __init__(self, route_limits: dict[str, tuple[float, float]], max_concurrency: int,
+                 max_queue: int, queue_timeout: float, max_clients: int = 100_000):
+        self.route_limits = route_limits
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_clients = max_clients
+        self.active = 0
+        self.rejected = Counter()
+        self._buckets: OrderedDict[tuple[str, str], TokenBucket] = OrderedDict()
+        self._waiters: deque[asyncio.Future] = deque()
+
+    def check_rate(self, client: str, path: str) -> float:
+        for prefix, (rate, burst) in self.route_limits.items():
+            if path.startswith(prefix):
+                break
+        else:
+            return 0.0
+
+        now = time.monotonic()
+        key = (client, prefix)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(rate, burst, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take(now)
+
+    async def acquire(self) -> bool:
+        if self.active < self.max_concurrency:
+            self.active += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            # release() may have handed over the slot just as the timeout
+            # fired; the slot is ours then and must be released by the caller.
+            if waiter.done() and not waiter.cancelled():
+                return True
+            self._discard_waiter(waiter)
+            return False
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._discard_waiter(waiter)
+            raise
+
+    def _discard_waiter(self, waiter: asyncio.Future):
+        # A dead waiter left in the deque would count against max_queue.
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self):
+        # Hand the slot straight to the oldest live waiter, if any.
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+admission = AdmissionController(
+    ROUTE_RATE_LIMITS,
+    max_concurrency=int(os.getenv("PMB_MAX_CONCURRENCY", "64")),
+    max_queue=int(os.getenv("PMB_MAX_QUEUE", "256")),
+    queue_timeout=float(os.getenv("PMB_QUEUE_TIMEOUT", "2")),
+) if ADMISSION_CONTROL else None
+
+def client_ip(request: Request) -> str:
+    if TRUST_FORWARDED_FOR and "x-forwarded-for" in request.headers:
+        return request.headers["x-forwarded-for"].split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+def _too_many_requests(retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many requests"},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
 
 # ======================================================
 # FASTAPI APP
 # ======================================================
 
-app = FastAPI(title="Modul PMB - Single File")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if registration_writer is not None:
+        await registration_writer.start()
+    load_outbox_handlers(OUTBOX_HANDLER_MODULES)
+    if outbox_dispatcher is not None and outbox_handlers:
+        await outbox_dispatcher.start()
+    yield
+    if outbox_dispatcher is not None:
+        await outbox_dispatcher.stop()
+    if registration_writer is not None:
+        await registration_writer.stop()
+
+app = FastAPI(title="Modul PMB - Single File", lifespan=lifespan)
+
+if admission is not None:
+    # Registered before instrument_request so that it runs inside it and
+    # rejected requests still show up in the metrics.
+    @app.middleware("http")
+    async def admission_control(request: Request, call_next):
+        retry_after = admission.check_rate(client_ip(request), request.url.path)
+        if retry_after:
+            admission.rejected["rate"] += 1
+            return _too_many_requests(retry_after)
+        if not await admission.acquire():
+            admission.rejected["concurrency"] += 1
+            return _too_many_requests(1)
+        try:
+            return await call_next(request)
+        finally:
+            admission.release()
+
+@app.middleware("http")
+async def instrument_request(request: Request, call_next):
+    stats = RequestStats()
+    token = request_stats.set(stats)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        request_stats.reset(token)
+
+    route = request.scope.get("route")
+    metrics.observe(
+        request.method, route.path if route else "unmatched",
+        response.status_code, time.perf_counter() - started, stats
+    )
+    if QUERY_COUNT_HEADER:
+        response.headers["X-Query-Count"] = str(stats.statements)
+        response.headers["X-Query-Time-Ms"] = f"{stats.sql_seconds * 1000:.2f}"
+    return response
+
+def migrate_schema(bind=engine):
+    """Bring an existing database up to the current models.
+
+    create_all only creates missing tables, so columns and indexes added
+    later to an existing table are created here.
+    """
+    for table in Base.metadata.sorted_tables:
+        existing = {c["name"] for c in inspect(bind).get_columns(table.name)}
+        with bind.begin() as conn:
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=bind.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+        for index in table.indexes:
+            index.create(bind, checkfirst=True)
+    create_search_index(bind)
 
 Base.metadata.create_all(bind=engine)
+migrate_schema()
+
+with SessionLocal() as _db:
+    # Existing pmb.db files predate pmb_counter; seed it once from the base table.
+    if _db.query(PMBCounter).first() is None and _db.query(CalonMahasiswa).first() is not None:
+        rebuild_counters(_db)
+    email_filter.load(_db)
+    prodi_catalog.refresh(_db)
 
 # ======================================================
-# ENDPOINT
+# SERVICE
 # ======================================================
 
-@app.post("/api/pmb/register", response_model=PMBResponse)
-def register_pmb(data: PMBRegister, db: Session = Depends(get_db)):
-    if db.query(CalonMahasiswa).filter_by(email=data.email).first():
+def _register_pmb(db: Session, data: PMBRegister) -> PMBResponse:
+    if data.email in email_filter and db.scalar(
+        select(CalonMahasiswa.id).where(CalonMahasiswa.email == data.email)
+    ) is not None:
         raise HTTPException(status_code=409, detail="Email already registered")
 
-    mahasiswa = CalonMahasiswa(
-        nama_lengkap=data.nama_lengkap,
-        email=data.email,
-        phone=data.phone,
-        alamat=data.alamat,
-        program_studi_id=data.program_studi_id
+    created_at = datetime.utcnow()
+    stmt = (
+        insert(CalonMahasiswa)
+        .values(**data.model_dump(), status=StatusEnum.pending, created_at=created_at)
+        .returning(
+            CalonMahasiswa.id, CalonMahasiswa.nama_lengkap, CalonMahasiswa.email,
+            CalonMahasiswa.status, CalonMahasiswa.nim
+        )
     )
+    try:
+        row = db.execute(stmt).one()
+    except IntegrityError as e:
+        db.rollback()
+        if not is_duplicate_email(e):
+            raise
+        raise HTTPException(status_code=409, detail="Email already registered")
 
-    db.add(mahasiswa)
+    bump_counter(db, data.program_studi_id, created_at.date(), total=1, pending=1)
+    emit_events(db, EVENT_REGISTERED, [
+        {"id": row.id, "email": row.email, "program_studi_id": data.program_studi_id}
+    ])
     db.commit()
-    db.refresh(mahasiswa)
-    return mahasiswa
+    email_filter.add(data.email)
+    return PMBResponse.model_validate(row)
 
 
-@app.put("/api/pmb/approve/{mahasiswa_id}", response_model=PMBResponse)
-def approve_pmb(mahasiswa_id: int, db: Session = Depends(get_db)):
-    mhs = db.query(CalonMahasiswa).filter_by(id=mahasiswa_id).first()
-    if not mhs:
-        raise HTTPException(status_code=404, detail="Data not found")
+APPROVE_RETRIES = 3
+
+def _approve_pmb(db: Session, mahasiswa_id: int) -> PMBResponse:
+    for _ in range(APPROVE_RETRIES):
+        mhs = db.query(CalonMahasiswa).filter_by(id=mahasiswa_id).first()
+        if not mhs:
+            raise HTTPException(status_code=404, detail="Data not found")
+
+        if mhs.status == StatusEnum.approved:
+            return PMBResponse.model_validate(mhs)
 
-    if mhs.status == StatusEnum.approved:
-        return mhs
+        prodi = prodi_catalog.get(mhs.program_studi_id)
+        if not prodi:
+            raise HTTPException(status_code=400, detail="Program studi not found")
 
-    prodi = db.query(ProgramStudi).filter_by(id=mhs.program_studi_id).first()
+        nim = generate_nim(datetime.now().year, prodi.kode, db)
+
+        # Compare-and-swap on the version that was read: a concurrent
+        # approval (double click, second admin, other worker) makes this
+        # match nothing instead of assigning a second NIM.
+        approved = db.execute(
+            update(CalonMahasiswa)
+            .where(CalonMahasiswa.id == mahasiswa_id, CalonMahasiswa.version == mhs.version)
+            .values(
+                nim=nim, status=StatusEnum.approved, approved_at=datetime.utcnow(),
+                version=CalonMahasiswa.version + 1
+            )
+            .returning(
+                CalonMahasiswa.id, CalonMahasiswa.nama_lengkap, CalonMahasiswa.email,
+                CalonMahasiswa.status, CalonMahasiswa.nim
+            )
+            .execution_options(synchronize_session=False)
+        ).first()
+
+        if approved is None:
+            # Roll back the NIM reservation and look at the row again.
+            db.rollback()
+            continue
+
+        was_pending = mhs.status == StatusEnum.pending
+        bump_counter(db, mhs.program_studi_id, mhs.created_at.date(), pending=-int(was_pending), approved=1)
+        emit_events(db, EVENT_APPROVED, [
+            {"id": approved.id, "nim": approved.nim, "program_studi_id": mhs.program_studi_id}
+        ])
+        db.commit()
+        status_cache.invalidate(mahasiswa_id)
+        return PMBResponse.model_validate(approved)
+
+    raise HTTPException(status_code=409, detail="Data was modified concurrently, retry later")
+
+
+BULK_APPROVE_RETRIES = 3
+
+def _approve_pmb_bulk(db: Session, data: PMBBulkApprove) -> PMBBulkApproveResult:
+    prodi = prodi_catalog.get(data.program_studi_id)
     if not prodi:
-        raise HTTPException(status_code=400, detail="Program studi not found")
+        raise HTTPException(status_code=404, detail="Program studi not found")
 
-    nim = generate_nim(datetime.now().year, prodi.kode, db)
+    query = (
+        select(CalonMahasiswa.id, CalonMahasiswa.created_at)
+        .where(
+            CalonMahasiswa.program_studi_id == prodi.id,
+            CalonMahasiswa.status == StatusEnum.pending,
+        )
+        .order_by(CalonMahasiswa.id)
+        .with_for_update(skip_locked=True)
+    )
+    if data.ids is not None:
+        query = query.where(CalonMahasiswa.id.in_(data.ids))
+    if data.created_from is not None:
+        query = query.where(CalonMahasiswa.created_at >= data.created_from)
+    if data.created_to is not None:
+        query = query.where(CalonMahasiswa.created_at < data.created_to)
 
-    mhs.nim = nim
-    mhs.status = StatusEnum.approved
-    mhs.approved_at = datetime.utcnow()
+    approve = (
+        update(CalonMahasiswa)
+        .where(
+            CalonMahasiswa.id == bindparam("_id"),
+            CalonMahasiswa.status == StatusEnum.pending,
+        )
+        .values(
+            nim=bindparam("_nim"), status=StatusEnum.approved, approved_at=bindparam("_at"),
+            version=CalonMahasiswa.version + 1
+        )
+    )
 
-    db.commit()
-    db.refresh(mhs)
-    return mhs
+    for _ in range(BULK_APPROVE_RETRIES):
+        selected = db.execute(query).all()
+        ids = [row.id for row in selected]
+        if not ids:
+            db.rollback()
+            return PMBBulkApproveResult(approved=0)
 
+        tahun = datetime.now().year
+        first = allocate_nim(tahun, prodi.kode, db, count=len(ids))
+        nims = [format_nim(tahun, prodi.kode, first + n) for n in range(len(ids))]
+        now = datetime.utcnow()
 
-@app.get("/api/pmb/status/{mahasiswa_id}", response_model=PMBResponse)
-def cek_status(mahasiswa_id: int, db: Session = Depends(get_db)):
+        result = db.connection().execute(
+            approve, [{"_id": i, "_nim": nim, "_at": now} for i, nim in zip(ids, nims)]
+        )
+        if result.rowcount == len(ids):
+            per_day = Counter(row.created_at.date() for row in selected)
+            for tanggal, n in per_day.items():
+                bump_counter(db, prodi.id, tanggal, pending=-n, approved=n)
+            emit_events(db, EVENT_APPROVED, [
+                {"id": i, "nim": nim, "program_studi_id": prodi.id} for i, nim in zip(ids, nims)
+            ])
+            db.commit()
+            status_cache.invalidate(*ids)
+            return PMBBulkApproveResult(approved=len(ids), nim_awal=nims[0], nim_akhir=nims[-1])
+
+        # Some rows were approved concurrently after they were selected;
+        # drop the block reservation and select again.
+        db.rollback()
+
+    raise HTTPException(status_code=409, detail="Concurrent approvals in progress, retry later")
+
+
+STATUS_CACHE_CONTROL = f"private, max-age={int(os.getenv('PMB_STATUS_MAX_AGE', '0'))}, must-revalidate"
+STATS_CACHE_CONTROL = f"public, max-age={int(os.getenv('PMB_STATS_MAX_AGE', '5'))}"
+
+def status_etag(mahasiswa_id: int, version: int) -> str:
+    # Every change to an applicant bumps its version, so (id, version)
+    # identifies the status representation; archiving keeps both.
+    return f'"pmb-{mahasiswa_id}-{version}"'
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+def _cek_status(db: Session, mahasiswa_id: int) -> tuple[str, bytes]:
+    # The active cycle answers almost every lookup; only misses hit the archive.
     mhs = db.query(CalonMahasiswa).filter_by(id=mahasiswa_id).first()
+    if not mhs:
+        mhs = db.query(CalonMahasiswaArsip).filter_by(id=mahasiswa_id).first()
     if not mhs:
         raise HTTPException(status_code=404, detail="Data not found")
-    return mhs
+    return status_etag(mhs.id, mhs.version), PMBResponse.model_validate(mhs).model_dump_json().encode()
 
+def _status_version(db: Session, mahasiswa_id: int) -> int | None:
+    version = db.scalar(select(CalonMahasiswa.version).where(CalonMahasiswa.id == mahasiswa_id))
+    if version is None:
+        version = db.scalar(select(CalonMahasiswaArsip.version).where(CalonMahasiswaArsip.id == mahasiswa_id))
+    return version
 
-@app.get("/api/pmb/stats")
-def statistik(db: Session = Depends(get_db)):
-    total = db.query(CalonMahasiswa).count()
-    approved = db.query(CalonMahasiswa).filter_by(status=StatusEnum.approved).count()
-    pending = db.query(CalonMahasiswa).filter_by(status=StatusEnum.pending).count()
+
+def _encode_cursor(created_at: datetime, mahasiswa_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), mahasiswa_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, mahasiswa_id = json.loads(base64.urlsafe_b64decode(cursor))
+        return datetime.fromisoformat(created_at), int(mahasiswa_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _list_pmb(db: Session, f: PMBListFilter) -> PMBListPage:
+    query = select(CalonMahasiswa).order_by(CalonMahasiswa.created_at, CalonMahasiswa.id)
+    if f.status is not None:
+        query = query.where(CalonMahasiswa.status == f.status)
+    if f.program_studi_id is not None:
+        query = query.where(CalonMahasiswa.program_studi_id == f.program_studi_id)
+    if f.created_from is not None:
+        query = query.where(CalonMahasiswa.created_at >= f.created_from)
+    if f.created_to is not None:
+        query = query.where(CalonMahasiswa.created_at < f.created_to)
+    if f.cursor is not None:
+        query = query.where(
+            tuple_(CalonMahasiswa.created_at, CalonMahasiswa.id) > _decode_cursor(f.cursor)
+        )
+
+    rows = db.scalars(query.limit(f.limit + 1)).all()
+    items = [PMBListItem.model_validate(r) for r in rows[:f.limit]]
+    next_cursor = None
+    if len(rows) > f.limit:
+        next_cursor = _encode_cursor(items[-1].created_at, items[-1].id)
+    return PMBListPage(items=items, next_cursor=next_cursor)
+
+
+def _search_pmb(db: Session, q: str, limit: int) -> list[PMBListItem]:
+    if any(len(term) < 3 for term in q.split()):
+        raise HTTPException(status_code=400, detail="Each search term needs at least 3 characters")
+
+    if db.get_bind().dialect.name == "sqlite":
+        rows = db.scalars(
+            select(CalonMahasiswa).from_statement(text(SEARCH_SQL)),
+            {"query": _fts_query(q), "limit": limit},
+        ).all()
+    else:
+        query = select(CalonMahasiswa).limit(limit)
+        for term in q.split():
+            query = query.where(or_(
+                *(getattr(CalonMahasiswa, c).ilike(f"%{term}%") for c in SEARCH_COLUMNS)
+            ))
+        rows = db.scalars(query).all()
+    return [PMBListItem.model_validate(r) for r in rows]
+
+
+def _statistik_etag(db: Session) -> str:
+    """ETag of the statistics report, read without building the report.
+
+    One SELECT, so the epoch and the sum come from the same snapshot.
+    """
+    epoch = select(PMBCounterEpoch.epoch).where(PMBCounterEpoch.id == 1).scalar_subquery()
+    row = db.execute(select(
+        func.coalesce(epoch, 0), func.coalesce(func.sum(PMBCounter.revisi), 0)
+    )).one()
+    return f'"stats-{row[0]}-{row[1]}"'
+
+def _statistik(db: Session) -> dict:
+    total = Counter()
+    per_prodi: dict[int, Counter] = {}
+    per_hari: dict[date, Counter] = {}
+
+    for c in db.query(PMBCounter):
+        delta = Counter(total_pendaftar=c.total, approved=c.approved, pending=c.pending)
+        total.update(delta)
+        per_prodi.setdefault(c.program_studi_id, Counter()).update(delta)
+        per_hari.setdefault(c.tanggal, Counter()).update(delta)
+
+    def as_dict(counts: Counter) -> dict:
+        return {k: counts[k] for k in ("total_pendaftar", "approved", "pending")}
 
     return {
-        "total_pendaftar": total,
-        "approved": approved,
-        "pending": pending
+        **as_dict(total),
+        "per_program_studi": [
+            {"program_studi_id": k, **as_dict(v)} for k, v in sorted(per_prodi.items())
+        ],
+        "per_hari": [
+            {"tanggal": k.isoformat(), **as_dict(v)} for k, v in sorted(per_hari.items())
+        ]
     }
+
+
+# ======================================================
+# ENDPOINT
+# ======================================================
+
+@app.post("/api/pmb/register", response_model=PMBResponse)
+async def register_pmb(data: PMBRegister, db: Session = Depends(get_db)):
+    if registration_writer is not None:
+        return await registration_writer.submit(data)
+    return await run_db(db, _register_pmb, data)
+
+
+@app.put("/api/pmb/approve/{mahasiswa_id}", response_model=PMBResponse)
+async def approve_pmb(mahasiswa_id: int, db: Session = Depends(get_db)):
+    return await run_db(db, _approve_pmb, mahasiswa_id)
+
+
+@app.post("/api/pmb/approve/bulk", response_model=PMBBulkApproveResult)
+async def approve_pmb_bulk(data: PMBBulkApprove, db: Session = Depends(get_db)):
+    return await run_db(db, _approve_pmb_bulk, data)
+
+
+@app.get("/api/pmb/status/{mahasiswa_id}", response_model=PMBResponse)
+async def cek_status(mahasiswa_id: int, request: Request, db: Session = Depends(get_db)):
+    if_none_match = request.headers.get("if-none-match")
+    cached = status_cache.get(mahasiswa_id)
+    if cached is None and if_none_match:
+        # Revalidation on a cache miss only needs the version column.
+        version = await run_db(db, _status_version, mahasiswa_id)
+        if version is not None:
+            etag = status_etag(mahasiswa_id, version)
+            if etag_matches(if_none_match, etag):
+                return Response(status_code=304, headers={"ETag": etag, "Cache-Control": STATUS_CACHE_CONTROL})
+    if cached is None:
+        fill = status_cache.begin_fill(mahasiswa_id)
+        try:
+            cached = await run_db(db, _cek_status, mahasiswa_id)
+            status_cache.set(mahasiswa_id, *cached, fill=fill)
+        finally:
+            status_cache.end_fill(mahasiswa_id, fill)
+
+    etag, payload = cached
+    headers = {"ETag": etag, "Cache-Control": STATUS_CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=payload, media_type="application/json", headers=headers)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/pmb/cache/stats")
+async def cache_stats():
+    return {"hits": status_cache.hits, "misses": status_cache.misses}
+
+
+@app.get("/api/pmb/list", response_model=PMBListPage)
+async def list_pmb(f: Annotated[PMBListFilter, Query()], db: Session = Depends(get_db)):
+    return await run_db(db, _list_pmb, f)
+
+
+@app.get("/api/pmb/export")
+def export_pmb(
+    fmt: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+    gzip: bool = False,
+    arsip: bool = Query(False, description="sertakan pendaftar yang sudah dipindahkan ke arsip"),
+):
+    filename = f"pmb.{fmt}" + (".gz" if gzip else "")
+    media_type = "application/gzip" if gzip else (
+        "text/csv" if fmt == "csv" else "application/x-ndjson"
+    )
+    return StreamingResponse(
+        iter_export(fmt, gzip, arsip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.get("/api/pmb/search", response_model=list[PMBListItem])
+async def search_pmb(
+    q: str = Query(min_length=3),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    return await run_db(db, _search_pmb, q, limit)
+
+
+@app.get("/api/pmb/stats")
+async def statistik(request: Request, db: Session = Depends(get_db)):
+    # The ETag is taken before the report, so a change in between can only
+    # make the next revalidation miss, never return a stale 304.
+    etag = await run_db(db, _statistik_etag)
+    headers = {"ETag": etag, "Cache-Control": STATS_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(await run_db(db, _statistik), headers=headers)
+
+
+@app.post("/api/pmb/register/batch", response_model=PMBBatchReport)
+async def register_pmb_batch(request: Request, db: Session = Depends(get_db)):
+    report = PMBBatchReport()
+    seen: set[str] = set()
+    chunk: list[tuple[int, PMBRegister]] = []
+
+    async def flush():
+        for result in await run_db(db, _insert_chunk, chunk, seen):
+            report.rows.append(result)
+            if result.status == "accepted":
+                report.accepted += 1
+            else:
+                report.duplicate += 1
+        chunk.clear()
+
+    async for row, record, error in _iter_records(request):
+        if record is not None:
+            try:
+                chunk.append((row, PMBRegister.model_validate(record)))
+            except ValidationError as e:
+                error = _validation_detail(e)
+        if error is not None:
+            report.invalid += 1
+            report.rows.append(BatchRowResult(row=row, status="invalid", detail=error))
+        if len(chunk) >= BATCH_CHUNK_SIZE:
+            await flush()
+    if chunk:
+        await flush()
+
+    report.rows.sort(key=lambda r: r.row)
+    return report
+
+# ======================================================
+# CLI
+# ======================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Modul PMB - perintah administrasi")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("rebuild-counters", help="hitung ulang pmb_counter dari calon_mahasiswa")
+    commands.add_parser("migrate", help="terapkan perubahan skema ke database yang sudah ada")
+    export = commands.add_parser("export", help="ekspor pendaftar ke CSV/NDJSON (arsip hanya dengan --arsip)")
+    export.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    export.add_argument("--gzip", action="store_true")
+    export.add_argument("--arsip", action="store_true",
+                        help="sertakan pendaftar yang sudah dipindahkan ke calon_mahasiswa_arsip")
+    export.add_argument("-o", "--output", help="file tujuan (default: stdout)")
+    archive = commands.add_parser("archive", help="pindahkan pendaftar tahun lalu ke calon_mahasiswa_arsip")
+    archive.add_argument("--tahun-aktif", type=int, default=datetime.now().year)
+    archive.add_argument("--batch-size", type=int, default=1000)
+    archive.add_argument("--pause-ms", type=float, default=10)
+    worker = commands.add_parser("outbox-worker", help="kirim event pmb_outbox di proses terpisah")
+    worker.add_argument("--batch-size", type=int, default=OUTBOX_BATCH_SIZE)
+    worker.add_argument("--poll-ms", type=float, default=OUTBOX_POLL_MS)
+    worker.add_argument("--once", action="store_true", help="berhenti setelah outbox kosong")
+    worker.add_argument("--handlers", action="append", default=OUTBOX_HANDLER_MODULES, metavar="MODULE",
+                        help="modul yang mendaftarkan @outbox_handler (bisa diulang)")
+    args = parser.parse_args()
+
+    if args.command == "rebuild-counters":
+        with SessionLocal() as db:
+            rebuild_counters(db)
+        print("pmb_counter rebuilt")
+    elif args.command == "migrate":
+        migrate_schema()
+        print("schema up to date")
+    elif args.command == "archive":
+        moved = archive_cycles(args.tahun_aktif, args.batch_size, args.pause_ms / 1000)
+        print(f"{moved} pendaftar dipindahkan ke arsip")
+    elif args.command == "outbox-worker":
+        load_outbox_handlers(args.handlers)
+        if not outbox_handlers:
+            parser.error("tidak ada handler outbox terdaftar; gunakan --handlers MODULE")
+        total = 0
+        try:
+            while True:
+                claimed = dispatch_outbox(args.batch_size)
+                total += claimed
+                if claimed < args.batch_size:
+                    if args.once:
+                        break
+                    time.sleep(args.poll_ms / 1000)
+        except KeyboardInterrupt:
+            pass
+        print(f"{total} event diproses")
+    elif args.command == "export":
+        out = open(args.output, "wb") if args.output else sys.stdout.buffer
+        try:
+            for chunk in iter_export(args.format, args.gzip, args.arsip):
+                out.write(chunk)
+        finally:
+            if args.output:
+                out.close()
@@ -0,0 +1,281 @@
+"""
+Benchmark Modul PMB
+Mengisi pmb.db dengan data ProgramStudi dan CalonMahasiswa, menjalankan
+PMB.py di uvicorn, lalu mengirim campuran request register / approve /
+status / stats dengan tingkat konkurensi tertentu. Hasilnya berupa laporan
+JSON (throughput dan latensi p50/p95/p99 per route) yang bisa dibandingkan
+antar commit. Respons 429 dari admission control dihitung sebagai
+"rejected" dan tidak masuk ke persentil latensi.
+
+    python bench_pmb.py --applicants 100000 --requests 5000 --concurrency 16 64 -o report.json
+    python bench_pmb.py --modes sync async --mix register=1,status=1
+
+Skenario overload (p99 request yang diterima harus tetap terbatas):
+
+    python bench_pmb.py --concurrency 256 --mix register=1,status=3 \
+        --env PMB_ADMISSION_CONTROL=1 --env PMB_MAX_CONCURRENCY=16 \
+        --env PMB_RATE_REGISTER=1000/1000 --env PMB_RATE_STATUS=1000/1000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+ROUTES = ("register", "approve", "status", "stats")
+FAKULTAS = ["Teknik", "Ekonomi", "Hukum", "Kedokteran", "MIPA", "Ilmu Budaya"]
+NAMA_DEPAN = ["Budi", "Siti", "Agus", "Dewi", "Rizki", "Putri", "Andi", "Nur", "Eko", "Ayu"]
+NAMA_BELAKANG = ["Santoso", "Lestari", "Pratama", "Wulandari", "Saputra", "Hidayat", "Kusuma"]
+
+
+# ==============================
+# SETUP
+# ==============================
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def pmb_cli(env: dict, *command: str):
+    subprocess.run(
+        [sys.executable, os.path.join(ROOT, "PMB.py"), *command],
+        env=env, check=True, stdout=subprocess.DEVNULL,
+    )
+
+
+def seed(db_path: str, env: dict, args):
+    """Create the schema through PMB.py, bulk-load rows, then rebuild counters."""
+    pmb_cli(env, "migrate")
+    rng = random.Random(args.seed)
+    start = datetime.now() - timedelta(days=30)
+
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany(
+            "INSERT INTO program_studi (id, kode, nama, fakultas) VALUES (?, ?, ?, ?)",
+            [(i, f"P{i:02d}", f"Program Studi {i}", rng.choice(FAKULTAS))
+             for i in range(1, args.prodi + 1)],
+        )
+        conn.executemany(
+            "INSERT INTO calon_mahasiswa "
+            "(id, nama_lengkap, email, phone, alamat, status, created_at, program_studi_id) "
+            "VALUES (?, ?, ?, ?, ?, 'pending', ?, ?)",
+            (
+                (
+                    i,
+                    f"{rng.choice(NAMA_DEPAN)} {rng.choice(NAMA_BELAKANG)}",
+                    f"seed{i}@example.com",
+                    f"08{rng.randrange(10**9, 10**10)}",
+                    f"Jl. Merdeka No. {rng.randrange(1, 300)}",
+                    (start + timedelta(seconds=i * 2592000 // max(args.applicants, 1))).isoformat(" "),
+                    rng.randrange(1, args.prodi + 1),
+                )
+                for i in range(1, args.applicants + 1)
+            ),
+        )
+    pmb_cli(env, "rebuild-counters")
+
+
+def start_server(env: dict, port: int, workers: int) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "PMB:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/api/pmb/stats", timeout=1)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+# ==============================
+# LOAD
+# ==============================
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def summarize(latencies: list[float], errors: int, rejected: int, elapsed: float) -> dict:
+    summary = {
+        "requests": len(latencies),
+        "errors": errors,
+        "rejected": rejected,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+    }
+    if latencies:
+        summary.update({
+            "p50_ms": round(statistics.median(latencies) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        })
+    return summary
+
+
+def make_plan(args, run_id: str) -> list[tuple[str, str, str, dict | None]]:
+    """Draw every request's route, target and payload up front.
+
+    Workers only replay the plan, so the request stream for a given seed is
+    the same whatever the concurrency or the order in which requests finish.
+    Approve and status targets are seeded applicants, never ids returned by
+    registrations made during the run.
+    """
+    rng = random.Random(args.seed)
+    routes, weights = zip(*args.mix.items())
+    approve_ids = list(range(1, args.applicants + 1))
+    rng.shuffle(approve_ids)
+
+    plan = []
+    for i, route in enumerate(rng.choices(routes, weights=weights, k=args.requests)):
+        if route == "register":
+            plan.append((route, "POST", "/api/pmb/register", {
+                "nama_lengkap": f"{rng.choice(NAMA_DEPAN)} {rng.choice(NAMA_BELAKANG)}",
+                "email": f"bench-{run_id}-{i}@example.com",
+                "phone": "081234567890",
+                "program_studi_id": rng.randrange(1, args.prodi + 1),
+            }))
+        elif route == "approve":
+            target = approve_ids.pop() if approve_ids else rng.randrange(1, args.applicants + 1)
+            plan.append((route, "PUT", f"/api/pmb/approve/{target}", None))
+        elif route == "status":
+            plan.append((route, "GET", f"/api/pmb/status/{rng.randrange(1, args.applicants + 1)}", None))
+        else:
+            plan.append((route, "GET", "/api/pmb/stats", None))
+    return plan
+
+
+async def drive(base_url: str, args, concurrency: int, run_id: str) -> dict:
+    latencies: dict[str, list[float]] = {r: [] for r in ROUTES}
+    errors: dict[str, int] = {r: 0 for r in ROUTES}
+    rejected: dict[str, int] = {r: 0 for r in ROUTES}
+    queue: asyncio.Queue[tuple[str, str, str, dict | None]] = asyncio.Queue()
+    for item in make_plan(args, run_id):
+        queue.put_nowait(item)
+
+    async def worker(client: httpx.AsyncClient):
+        while not queue.empty():
+            route, method, path, payload = queue.get_nowait()
+            t = time.perf_counter()
+            try:
+                r = await client.request(method, path, json=payload)
+                if r.status_code == 429:
+                    rejected[route] += 1
+                    continue
+                ok = r.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencies[route].append(time.perf_counter() - t)
+            errors[route] += not ok
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    every = [x for v in latencies.values() for x in v]
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "overall": summarize(every, sum(errors.values()), sum(rejected.values()), elapsed),
+        "routes": {
+            r: summarize(latencies[r], errors[r], rejected[r], elapsed)
+            for r in ROUTES if latencies[r] or rejected[r]
+        },
+    }
+
+
+def run_mode(mode: str, args) -> dict:
+    results = {}
+    for concurrency in args.concurrency:
+        with tempfile.TemporaryDirectory() as workdir:
+            db_path = os.path.join(workdir, "pmb.db")
+            env = {
+                **os.environ,
+                "PYTHONPATH": ROOT,
+                "PMB_DB_MODE": mode,
+                "PMB_DATABASE_URL": f"sqlite:///{db_path}",
+                **dict(kv.split("=", 1) for kv in args.env),
+            }
+            seed(db_path, env, args)
+            port = free_port()
+            proc = start_server(env, port, args.workers)
+            try:
+                results[str(concurrency)] = asyncio.run(
+                    drive(f"http://127.0.0.1:{port}", args, concurrency, f"{mode}{concurrency}")
+                )
+            finally:
+                proc.terminate()
+                proc.wait()
+    return results
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        route, weight = part.split("=")
+        if route not in ROUTES:
+            raise argparse.ArgumentTypeError(f"unknown route {route!r}")
+        mix[route] = float(weight)
+    return mix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test dan benchmark latensi Modul PMB")
+    parser.add_argument("--prodi", type=int, default=40)
+    parser.add_argument("--applicants", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[32])
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("register=30,approve=10,status=50,stats=10"))
+    parser.add_argument("--modes", nargs="+", default=["sync"], choices=["sync", "async"])
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="variabel lingkungan tambahan untuk server")
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("-o", "--output", help="tulis laporan JSON ke file")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {k: v for k, v in vars(args).items() if k != "output"},
+        },
+        "results": {mode: run_mode(mode, args) for mode in args.modes},
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
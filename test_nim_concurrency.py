@@ -0,0 +1,121 @@
+"""
+Uji konkurensi alokasi NIM
+Ratusan approval berjalan paralel dari beberapa proses (masing-masing dengan
+beberapa thread) terhadap satu database SQLite. Setiap pendaftar di-approve
+dua kali oleh proses yang berbeda, sehingga double approve juga teruji.
+Hasil akhirnya harus: semua pendaftar approved, NIM unik dan berurutan
+tanpa celah, dan nim_sequence sama dengan jumlah pendaftar.
+
+    python -m pytest -q test_nim_concurrency.py
+    python test_nim_concurrency.py --applicants 1000 --processes 8 --threads 16
+"""
+
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+KODE_PRODI = "IF1"
+
+
+def seed(db_path: str, applicants: int):
+    env = {**os.environ, "PMB_DATABASE_URL": f"sqlite:///{db_path}"}
+    subprocess.run(
+        [sys.executable, os.path.join(ROOT, "PMB.py"), "migrate"],
+        env=env, check=True, stdout=subprocess.DEVNULL,
+    )
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            "INSERT INTO program_studi (id, kode, nama, fakultas) VALUES (1, ?, 'Informatika', 'Teknik')",
+            (KODE_PRODI,),
+        )
+        conn.executemany(
+            "INSERT INTO calon_mahasiswa "
+            "(id, nama_lengkap, email, phone, status, created_at, program_studi_id) "
+            "VALUES (?, ?, ?, '081234567890', 'pending', CURRENT_TIMESTAMP, 1)",
+            [(i, f"Pendaftar {i}", f"pendaftar{i}@example.com") for i in range(1, applicants + 1)],
+        )
+
+
+def approve_all(db_path: str, ids: list[int], threads: int) -> list[tuple[int, int, str | None]]:
+    # Dijalankan di proses anak: PMB diimpor setelah PMB_DATABASE_URL diset.
+    os.environ["PMB_DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["PMB_OUTBOX_DISPATCH"] = "0"
+    # 32 writers on one SQLite file can starve a waiter past the default
+    # 5 s busy timeout on a small machine; this test checks NIM allocation,
+    # not lock fairness.
+    os.environ.setdefault("PMB_SQLITE_BUSY_TIMEOUT_MS", "60000")
+    sys.path.insert(0, ROOT)
+    import PMB
+    from fastapi.testclient import TestClient
+
+    client = TestClient(PMB.app)
+
+    def approve(mahasiswa_id: int):
+        r = client.put(f"/api/pmb/approve/{mahasiswa_id}")
+        return mahasiswa_id, r.status_code, r.json().get("nim") if r.status_code == 200 else None
+
+    with ThreadPoolExecutor(threads) as pool:
+        return list(pool.map(approve, ids))
+
+
+def run(applicants: int, processes: int, threads: int) -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "pmb.db")
+        seed(db_path, applicants)
+
+        ids = list(range(1, applicants + 1))
+        # Setiap id muncul di dua proses berbeda (double approve lintas proses).
+        chunks = [ids[k::processes] + ids[(k + 1) % processes::processes] for k in range(processes)]
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(processes) as pool:
+            results = [
+                row for part in pool.starmap(approve_all, [(db_path, c, threads) for c in chunks])
+                for row in part
+            ]
+
+        with sqlite3.connect(db_path) as conn:
+            rows = conn.execute("SELECT id, status, nim FROM calon_mahasiswa").fetchall()
+            sequence = conn.execute("SELECT tahun, kode_prodi, last_number FROM nim_sequence").fetchall()
+
+    return {"results": results, "rows": rows, "sequence": sequence}
+
+
+def check(outcome: dict, applicants: int):
+    statuses = Counter(status for _, status, _ in outcome["results"])
+    assert statuses == {200: 2 * applicants}, statuses
+
+    # Kedua approval atas pendaftar yang sama harus melihat NIM yang sama.
+    per_id: dict[int, set] = {}
+    for mahasiswa_id, _, nim in outcome["results"]:
+        per_id.setdefault(mahasiswa_id, set()).add(nim)
+    assert all(len(nims) == 1 for nims in per_id.values())
+
+    assert all(status == "approved" for _, status, _ in outcome["rows"])
+    nims = sorted(nim for _, _, nim in outcome["rows"])
+    assert len(set(nims)) == applicants
+    tahun = nims[0][:4]
+    prefix = f"{tahun}{KODE_PRODI}"
+    assert nims == [f"{prefix}{n:04d}" for n in range(1, applicants + 1)]
+    assert outcome["sequence"] == [(int(tahun), KODE_PRODI, applicants)]
+
+
+def test_parallel_approvals_allocate_contiguous_nims():
+    applicants = 400
+    check(run(applicants, processes=4, threads=8), applicants)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Uji konkurensi alokasi NIM Modul PMB")
+    parser.add_argument("--applicants", type=int, default=400)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+    check(run(args.applicants, args.processes, args.threads), args.applicants)
+    print(f"OK: {args.applicants} pendaftar, NIM unik dan berurutan")